@@ -5,6 +5,8 @@ import random
 import signal
 import sys
 import time
+import traceback
+import numpy as np
 
 
 from which_pyqt import PYQT_VER
@@ -29,10 +31,20 @@ from TSPClasses import *
 
 
 class PointLineView( QWidget ):
+	# Level of detail: arrowheads are only drawn while at most ARROW_LIMIT
+	# edges are in view, labels while at most LABEL_LIMIT labels are, and
+	# antialiasing is on while at most ANTIALIAS_LIMIT edges and cities are
+	ARROW_LIMIT = 2000
+	LABEL_LIMIT = 500
+	ANTIALIAS_LIMIT = 5000
+	# Zoom factor per mouse wheel step
+	ZOOM_STEP = 1.25
+
 	def __init__( self, status_bar, data_range ):
 		super(QWidget,self).__init__()
 		self.setMinimumSize(950,600)
 
+		# Per color, lists of coordinate array chunks (see _sceneGeometry)
 		self.pointList	= {}
 		self.edgeList	= {}
 		self.labelList	 = {}
@@ -40,12 +52,18 @@ class PointLineView( QWidget ):
 		self.data_range = data_range
 		self.start_pt = None
 		self.end_pt = None
+		self._scene = {}
+		self._zoom = 1.0
+		self._center = (0.0, 0.0)
+		self._drag = None
 
 	def displayStatusText(self, text):
 		self.status_bar.showMessage(text)
 
 	def clearPoints(self):
 		self.pointList = {}
+		self._scene.pop( 'points', None )
+		self.resetView()
 
 	def clearEdges(self,removeColors = None):
 		self.edgeList = {}
@@ -55,13 +73,16 @@ class PointLineView( QWidget ):
 					del self.labelList[color]			
 		else:
 			self.labelList = {}
-		self.repaint()
+		self._scene.pop( 'edges', None )
+		self._scene.pop( 'labels', None )
+		self.update()
 
 	def addPoints( self, point_list, color ):
-		if color in self.pointList:
-			self.pointList[color].extend( point_list )
-		else:
-			self.pointList[color] = point_list
+		self.addPointArrays( [pt.x() for pt in point_list], [pt.y() for pt in point_list], color )
+
+	def addPointArrays( self, xs, ys, color ):
+		self.pointList.setdefault( color, [] ).append( (np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)) )
+		self._scene.pop( 'points', None )
 
 #	def setStartLoc( self, point ):
 #		self.start_pt = point
@@ -73,36 +94,65 @@ class PointLineView( QWidget ):
 
 
 	def addEdge( self, startPt, endPt, label, edgeColor, labelColor=None, xoffset=0.0 ):
-		if not labelColor:
-			labelColor = edgeColor
-
 		assert( type(startPt) == QPointF )
 		assert( type(endPt)	  == QPointF )
 		assert( type(label)	  == str )
 
-		edge = QLineF(startPt, endPt)
-		if edgeColor in self.edgeList.keys():
-			self.edgeList[edgeColor].append( edge )
-		else:
-			self.edgeList[edgeColor] = [edge]
-
-		midp = QPointF( (edge.x1()*0.2 + edge.x2()*0.8), 
-						(edge.y1()*0.2 + edge.y2()*0.8) )
-		self.addLabel( midp, label, labelColor, xoffset=xoffset )
-
-	def addLabel( self, point, label, labelColor,xoffset=0.0 ):
-		if labelColor in self.labelList.keys():
-			self.labelList[labelColor].append( (point,label,xoffset) )
-		else:
-			self.labelList[labelColor] = [(point,label,xoffset)]
-
+		self.addEdgeArrays( [startPt.x()], [startPt.y()], [endPt.x()], [endPt.y()], [label], \
+							edgeColor, labelColor, xoffset=xoffset )
 
+	# Many edges at once: arrays of their end coordinates and one label each
+	def addEdgeArrays( self, x1, y1, x2, y2, labels, edgeColor, labelColor=None, xoffset=0.0 ):
+		if not labelColor:
+			labelColor = edgeColor
 
+		x1, y1, x2, y2 = (np.asarray(coords, dtype=float) for coords in (x1, y1, x2, y2))
+		self.edgeList.setdefault( edgeColor, [] ).append( (x1, y1, x2, y2) )
+		self._scene.pop( 'edges', None )
 
-	def paintEvent(self, event):
-		painter = QPainter(self)
-		painter.setRenderHint(QPainter.Antialiasing,True)
+		self.addLabelArrays( x1*0.2 + x2*0.8, y1*0.2 + y2*0.8, labels, labelColor, xoffset=xoffset )
 
+	def addLabel( self, point, label, labelColor,xoffset=0.0 ):
+		self.addLabelArrays( [point.x()], [point.y()], [label], labelColor, xoffset=xoffset )
+
+	def addLabelArrays( self, xs, ys, labels, labelColor, xoffset=0.0 ):
+		self.labelList.setdefault( labelColor, [] ).append( \
+			(np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), labels, xoffset) )
+		self._scene.pop( 'labels', None )
+
+	''' <summary>
+		Everything added so far merged per color: edges as an (n, 4) array of
+		end coordinates plus the QLineFs to draw, points as an (n, 2) array
+		plus a QPolygonF, and labels as coordinate and offset arrays plus their
+		texts.  Each kind is built once after it changes and reused by every
+		repaint (resizing, zooming and panning only change the transform), so
+		a new tour does not rebuild the cities.
+		</summary> '''
+	def _sceneGeometry( self ):
+		if 'edges' not in self._scene:
+			edges = {}
+			for color, chunks in self.edgeList.items():
+				ends = np.concatenate( [np.column_stack(chunk) for chunk in chunks] )
+				edges[color] = (ends, [QLineF(*end) for end in ends.tolist()])
+			self._scene['edges'] = edges
+		if 'points' not in self._scene:
+			points = {}
+			for color, chunks in self.pointList.items():
+				xy = np.concatenate( [np.column_stack(chunk) for chunk in chunks] )
+				points[color] = (xy, QPolygonF( [QPointF(x, y) for x, y in xy.tolist()] ))
+			self._scene['points'] = points
+		if 'labels' not in self._scene:
+			labels = {}
+			for color, chunks in self.labelList.items():
+				xs = np.concatenate( [chunk[0] for chunk in chunks] )
+				ys = np.concatenate( [chunk[1] for chunk in chunks] )
+				offsets = np.concatenate( [np.full(len(chunk[0]), chunk[3]) for chunk in chunks] )
+				labels[color] = (xs, ys, offsets, [text for chunk in chunks for text in chunk[2]])
+			self._scene['labels'] = labels
+		return self._scene['edges'], self._scene['points'], self._scene['labels']
+
+	# Pixels per data unit: the whole data range fits the widget at zoom 1
+	def _scale( self ):
 		xr = self.data_range['x']
 		yr = self.data_range['y']
 		w = self.width()
@@ -112,82 +162,167 @@ class PointLineView( QWidget ):
 			 scale = w / (xr[1]-xr[0])
 		else:
 			 scale = h / (yr[1]-yr[0])
+		return scale * self._zoom
+
+	def resetView( self ):
+		self._zoom = 1.0
+		self._center = (0.0, 0.0)
+		self.update()
+
+	# Zooms by factor (never out past the whole data range), keeping the data
+	# point under anchor (a widget position, the middle by default) in place
+	def zoomBy( self, factor, anchor=None ):
+		if anchor is None:
+			anchor = QPointF( self.width()/2.0, self.height()/2.0 )
+		dx, dy = anchor.x() - self.width()/2.0, self.height()/2.0 - anchor.y()
+		scale = self._scale()
+		x, y = self._center[0] + dx/scale, self._center[1] + dy/scale
+		self._zoom = max( 1.0, self._zoom * factor )
+		scale = self._scale()
+		self._center = (x - dx/scale, y - dy/scale)
+		self.update()
+
+	def wheelEvent(self, event):
+		steps = (event.angleDelta().y() if hasattr(event, 'angleDelta') else event.delta()) / 120.0
+		self.zoomBy( self.ZOOM_STEP ** steps, QPointF(event.pos()) )
+
+	def mousePressEvent(self, event):
+		self._drag = event.pos()
+
+	def mouseMoveEvent(self, event):
+		if self._drag is not None:
+			scale = self._scale()
+			delta = event.pos() - self._drag
+			self._center = (self._center[0] - delta.x()/scale, self._center[1] + delta.y()/scale)
+			self._drag = event.pos()
+			self.update()
+
+	def mouseReleaseEvent(self, event):
+		self._drag = None
+
+	def mouseDoubleClickEvent(self, event):
+		self.resetView()
+
+
+
+	def paintEvent(self, event):
+		painter = QPainter(self)
+		edges, points, labels = self._sceneGeometry()
+
+		w = self.width()
+		h = self.height()
+		scale = self._scale()
+		cx, cy = self._center
+		# The part of the data plane that is on screen
+		x_lo, x_hi = cx - w/2.0/scale, cx + w/2.0/scale
+		y_lo, y_hi = cy - h/2.0/scale, cy + h/2.0/scale
 
 		tform = QTransform()
 		tform.translate(self.width()/2.0,self.height()/2.0)
-		tform.scale(1.0,-1.0)
+		tform.scale(scale,-scale)
+		tform.translate(-cx,-cy)
 		painter.setTransform(tform)
 
-		for color in self.edgeList:
-			c = QColor(color[0],color[1],color[2])
-			painter.setPen( c )
-			for edge in self.edgeList[color]:
-				ln = QLineF( scale*edge.x1(), scale*edge.y1(), scale*edge.x2(), scale*edge.y2() )
-				painter.drawLine( ln )
-
-		for color in self.edgeList:
-			c = QColor(color[0],color[1],color[2])
-			painter.setPen( c )
-			for edge in self.edgeList[color]:
-				#arrow_scale = .015
-				arrow_scale = 5.0
-				unit_edge = ( edge.x2() - edge.x1(), edge.y2() - edge.y1() )
-				unit_edge_mag = math.sqrt( ( edge.x2() - edge.x1())**2 + ( edge.y2() - edge.y1() )**2 )
-				unit_edge = (unit_edge[0] / unit_edge_mag, unit_edge[1] / unit_edge_mag )
-				unit_edge_perp = (-unit_edge[1], unit_edge[0])
-
-				temp_tform = QTransform()
-				temp_tform.translate(self.width()/2.0,self.height()/2.0)
-				temp_tform.scale(1.0,-1.0)
-				temp_tform.translate(scale*edge.x2(),scale*edge.y2())
-				temp_tform.scale(1.0,-1.0)
-				painter.setTransform(temp_tform)
-				#painter.drawText( RECT, label[1], align )
-
-				tri_pts = []
-				tri_pts.append( QPointF(0,0) )
-				tri_pts.append( QPointF(-arrow_scale*(2*unit_edge[0] + unit_edge_perp[0]),
-										arrow_scale*(2*unit_edge[1] + unit_edge_perp[1])) )
-				tri_pts.append( QPointF(-arrow_scale*(2*unit_edge[0] - unit_edge_perp[0]),
-										arrow_scale*(2*unit_edge[1] - unit_edge_perp[1])) )
-				tri = QPolygonF( tri_pts )
+		# Edges with any part of their bounding box on screen, and cities on screen
+		shown_edges = {}
+		for color, (ends, lines) in edges.items():
+			xs, ys = ends[:,0::2], ends[:,1::2]
+			shown_edges[color] = np.flatnonzero( (xs.max(axis=1) >= x_lo) & (xs.min(axis=1) <= x_hi) & \
+												 (ys.max(axis=1) >= y_lo) & (ys.min(axis=1) <= y_hi) )
+		shown_points = sum( int(((xy[:,0] >= x_lo) & (xy[:,0] <= x_hi) & (xy[:,1] >= y_lo) & (xy[:,1] <= y_hi)).sum()) \
+							for xy, polygon in points.values() )
+		nshown_edges = sum( len(shown) for shown in shown_edges.values() )
+		painter.setRenderHint(QPainter.Antialiasing, nshown_edges + shown_points <= self.ANTIALIAS_LIMIT)
+
+		for color, (ends, lines) in edges.items():
+			painter.setPen( self._cosmeticPen(color, 1.0) )
+			shown = shown_edges[color]
+			painter.drawLines( lines if len(shown) == len(lines) else [lines[i] for i in shown] )
+
+		if nshown_edges <= self.ARROW_LIMIT:
+			#arrow_scale = .015
+			arrow_scale = 5.0 / scale						# 5 pixels, in data units
+			for color, (ends, lines) in edges.items():
+				c = QColor(color[0],color[1],color[2])
+				painter.setPen( self._cosmeticPen(color, 1.0) )
 				b = painter.brush()
 				painter.setBrush( c )
-				painter.drawPolygon( tri )
+				ends = ends[shown_edges[color]]
+				vec = ends[:,2:] - ends[:,:2]
+				mag = np.hypot( vec[:,0], vec[:,1] )
+				ends, vec, mag = ends[mag > 0], vec[mag > 0], mag[mag > 0]
+				unit_edge = vec / mag[:,np.newaxis]
+				unit_edge_perp = np.column_stack( (-unit_edge[:,1], unit_edge[:,0]) )
+				tips = ends[:,2:]
+				left = tips - arrow_scale*(2*unit_edge + unit_edge_perp)
+				right = tips - arrow_scale*(2*unit_edge - unit_edge_perp)
+				for tri in np.stack( (tips, left, right), axis=1 ).tolist():
+					painter.drawPolygon( QPolygonF( [QPointF(x, y) for x, y in tri] ) )
 				painter.setBrush( b )
 
-		painter.setTransform(tform)
 		font = QFont("Monospace")
 		font.setStyleHint(QFont.TypeWriter)
 
 		R = 1.0E3
 		CITY_SIZE = 2.0 # DIAMETER
-		RECT = QRectF(-R,-R,2.0*R,2.0*R)
 		align = QTextOption( Qt.Alignment(Qt.AlignHCenter | Qt.AlignVCenter) )
-		for color in self.labelList:
-			c = QColor(color[0],color[1],color[2])
-			painter.setPen( c )
-			for label in self.labelList[color]:
-				temp_tform = QTransform()
-				temp_tform.translate(self.width()/2.0,self.height()/2.0)
-				temp_tform.scale(1.0,-1.0)
-				pt = label[0]
-				xoff = label[2]
-				temp_tform.translate(scale*pt.x()+xoff,scale*pt.y())
-				temp_tform.scale(1.0,-1.0)
-				painter.setTransform(temp_tform)
-				painter.drawText( RECT, label[1], align )
-
-		painter.setTransform(tform)
-		for color in self.pointList:
-			c = QColor(color[0],color[1],color[2])
-			painter.setPen( c )
-			b = painter.brush()
-			painter.setBrush(c)
-			for point in self.pointList[color]:
-				pt = QPointF(scale*point.x(), scale*point.y())
-				painter.drawEllipse( pt, CITY_SIZE, CITY_SIZE)
-			painter.setBrush(b)
+		shown_labels = {}
+		for color, (xs, ys, offsets, texts) in labels.items():
+			shown_labels[color] = np.flatnonzero( (xs >= x_lo) & (xs <= x_hi) & (ys >= y_lo) & (ys <= y_hi) )
+		if sum( len(shown) for shown in shown_labels.values() ) <= self.LABEL_LIMIT:
+			# Text is drawn unscaled and upright, centred on each label's screen position
+			painter.resetTransform()
+			for color, (xs, ys, offsets, texts) in labels.items():
+				c = QColor(color[0],color[1],color[2])
+				painter.setPen( c )
+				shown = shown_labels[color]
+				screen_xs = w/2.0 + scale*(xs[shown] - cx) + offsets[shown]
+				screen_ys = h/2.0 - scale*(ys[shown] - cy)
+				for i, sx, sy in zip( shown.tolist(), screen_xs.tolist(), screen_ys.tolist() ):
+					painter.drawText( QRectF(sx-R,sy-R,2.0*R,2.0*R), '{}'.format(texts[i]), align )
+
+		painter.resetTransform()
+		for color, (xy, polygon) in points.items():
+			# One round dot per city, the size drawEllipse gave each one.  Wide points
+			# get stretched by a scaling transform, so they are mapped to the screen first.
+			pen = self._cosmeticPen(color, 2.0*CITY_SIZE + 1.0)
+			pen.setCapStyle( Qt.RoundCap )
+			painter.setPen( pen )
+			painter.drawPoints( tform.map(polygon) )
+
+	# A pen whose width is in pixels whatever the zoom
+	def _cosmeticPen( self, color, width ):
+		pen = QPen( QColor(color[0],color[1],color[2]) )
+		pen.setWidthF( width )
+		pen.setCosmetic( True )
+		return pen
+
+
+
+# Runs one solve on a QThread (see Proj5GUI.solveClicked).  Every improved
+# BSSF the solver reports comes back through the improved signal and the
+# results dictionary (None if the solver raised) through finished; both are
+# delivered to the GUI thread by Qt's queued connections.
+class SolveWorker( QObject ):
+	improved = pyqtSignal(object)
+	finished = pyqtSignal(object)
+
+	def __init__( self, solver, method, time_allowance ):
+		super(SolveWorker,self).__init__()
+		self.solver = solver
+		self.method = method
+		self.time_allowance = time_allowance
+
+	def run( self ):
+		results = None
+		self.solver.callback = self.improved.emit
+		try:
+			results = getattr(self.solver, self.method)( time_allowance=self.time_allowance )
+		except Exception:
+			traceback.print_exc()
+		finally:
+			self.solver.callback = None
+		self.finished.emit( results )
 
 
 
@@ -201,6 +336,8 @@ class Proj5GUI( QMainWindow ):
 		self._MAX_SEED = 1000 
 
 		self._scenario = None
+		self._thread = None
+		self._worker = None
 		self.initUI()
 		self.solver = TSPSolver( self.view )
 		self.genParams = {'size':None,'seed':None,'diff':None}
@@ -241,15 +378,13 @@ class Proj5GUI( QMainWindow ):
 
 
 	def addCities( self ):
-		cities = self._scenario.getCities()
 		self.view.clearEdges()
-		for city in cities:
-		   self.view.addLabel( QPointF(city._x, city._y), city._name, \
-							   labelColor=(128,128,128), xoffset=10.0 )
+		self.view.addLabelArrays( self._scenario._xs, self._scenario._ys, self._scenario._names, \
+								  labelColor=(128,128,128), xoffset=10.0 )
 
 	def generateClicked(self):
 		self.generateNetwork()
-		self.view.addPoints( [QPointF(c._x,c._y) for c in self._scenario.getCities()], (0,0,0) )
+		self.view.addPointArrays( self._scenario._xs, self._scenario._ys, (0,0,0) )
 		self.solveButton.setEnabled(True)
 		self.graphReady = True
 		self.checkGenInputs()
@@ -263,19 +398,17 @@ class Proj5GUI( QMainWindow ):
 		self.view.repaint()
 
 
-	def displaySolution( self ) :						# what about calling this somehow every time a new bssf is found?
+	def displaySolution( self ) :						# called for every improved bssf while solving, and at the end
 		self.view.clearEdges([(64,64,255)])				# get rid of edge labels but not point labels
 		if self._solution:
 			self.addCities()
-			edges = self._solution.enumerateEdges()
+			edges = self._solution.enumerateEdgeArrays()
 			if edges:
 				edgeColor  = (128,128,255)
 				labelColor = (64,64,255)
-				for edge in edges:
-					pt1,pt2,label = edge
-					self.view.addEdge( QPointF(pt1._x,pt1._y), \
-									   QPointF(pt2._x,pt2._y), \
-									   '{}'.format(label), edgeColor, labelColor )
+				src, dst, labels = edges
+				xs, ys = self._scenario._xs, self._scenario._ys
+				self.view.addEdgeArrays( xs[src], ys[src], xs[dst], ys[dst], labels, edgeColor, labelColor )
 		else:
 			self.statusBar.showMessage('No Solution Found.')
 		self.view.repaint()
@@ -286,11 +419,17 @@ class Proj5GUI( QMainWindow ):
 		self.curSeed.setText( '{}'.format(new_seed) )
 		self.view.repaint()
 
-	def solveClicked(self):								# need to reset display??? and say "processing..." at bottom???
+	def solving(self):
+		return self._thread is not None
+
+	# The solver runs on a worker thread so the window stays responsive: improved
+	# tours are drawn as they arrive (solutionImproved), Cancel stops the run early
+	# and solveFinished shows the results.
+	def solveClicked(self):
 		self.solver.setupWithScenario(self._scenario)
+		self.solver.resetCancel()						# so that Cancel works before the thread gets going
 
 		max_time = float( self.timeLimit.text() )
-		# TODO - start on a separate thread
 		self.view.clearEdges([(64,64,255)])				# get rid of edge labels but not point labels
 		self.numSolutions.setText( '--' )
 		self.tourCost.setText( '--' )
@@ -299,12 +438,43 @@ class Proj5GUI( QMainWindow ):
 		self.totalStates.setText( '--' )
 		self.prunedStates.setText( '--' )
 		self.statusBar.showMessage('Processing...')
-		#self.view.repaint()
-		#app.processEvents()
-		solve_func = 'self.solver.'+self.ALGORITHMS[self.algDropDown.currentIndex()][1]
-		results = eval(solve_func)(time_allowance=max_time )
+
+		self.solveButton.setEnabled(False)
+		self.generateButton.setEnabled(False)
+		self.cancelButton.setEnabled(True)
+		self._thread = QThread()
+		self._worker = SolveWorker( self.solver, self.ALGORITHMS[self.algDropDown.currentIndex()][1], max_time )
+		self._worker.moveToThread( self._thread )
+		self._thread.started.connect( self._worker.run )
+		self._worker.improved.connect( self.solutionImproved )
+		self._worker.finished.connect( self.solveFinished )
+		self._thread.start()
+
+	def cancelClicked(self):
+		if self.solving():
+			self.solver.cancel()
+			self.cancelButton.setEnabled(False)
+			self.statusBar.showMessage('Cancelling...')
+
+	def solutionImproved(self, update):
+		self.numSolutions.setText( '{}'.format(update['count']) )
+		self.tourCost.setText( '{}'.format(update['cost']) )
+		self.solvedIn.setText( '{:6.6f} seconds'.format(update['time']) )
+		self._solution = update['soln']
+		self.displaySolution()
+
+	def solveFinished(self, results):
+		self._thread.quit()
+		self._thread.wait()
+		self._thread = None
+		self._worker = None
+		self.cancelButton.setEnabled(False)
+		self.checkGenInputs()
 		if results:
-			self.statusBar.showMessage('')
+			if results.get('status') == 'memory':
+				self.statusBar.showMessage('Too many cities for this solver.')
+			else:
+				self.statusBar.showMessage('Cancelled.' if results.get('cancelled') else '')
 			self.numSolutions.setText( '{}'.format(results['count']) )
 			self.tourCost.setText( '{}'.format(results['cost']) )
 			self.solvedIn.setText( '{:6.6f} seconds'.format(results['time']) )
@@ -320,14 +490,24 @@ class Proj5GUI( QMainWindow ):
 		else:
 			print( 'GOT NULL SOLUTION BACK!!' )		#probably shouldn't ever use this...
 		self.view.repaint()
-#		app.processEvents()
+
+	# Don't leave a solve running on its thread when the window goes away
+	def closeEvent(self, event):
+		if self.solving():
+			self.solver.cancel()
+			self._thread.quit()
+			self._thread.wait()
+		super(Proj5GUI,self).closeEvent(event)
 
 	def checkGenInputs(self):
 		seed  = self.curSeed.text()
 		size = self.size.text()
 		diff = self.diffDropDown.currentText()
 
-		if self._scenario:
+		if self.solving():
+			self.generateButton.setEnabled(False)
+			self.solveButton.setEnabled(False)
+		elif self._scenario:
 			if self.genParams['seed'] == seed and \
 			   self.genParams['size'] == size and \
 			   self.genParams['diff'] == diff:
@@ -369,7 +549,9 @@ class Proj5GUI( QMainWindow ):
 		('Default                            ','defaultRandomTour'), \
 		('Greedy','greedy'), \
 		('Branch and Bound','branchAndBound'), \
-		('Fancy','fancy') \
+		('Held-Karp','heldKarp'), \
+		('Fancy','fancy'), \
+		('Lin-Kernighan','linKernighan') \
 	]															# whitespace hack to get longest to display correctly
 
 	def initUI( self ):
@@ -393,6 +575,7 @@ class Proj5GUI( QMainWindow ):
 		self.randSeedButton = QPushButton('Randomize Seed')
 		self.generateButton = QPushButton('Generate Scenario')
 		self.solveButton	= QPushButton('Solve TSP')
+		self.cancelButton	= QPushButton('Cancel')
 
 		self.curSeed		= QLineEdit('20')
 		self.curSeed.setFixedWidth(100)
@@ -461,6 +644,7 @@ class Proj5GUI( QMainWindow ):
 		h.addWidget( self.timeLimit )
 		h.addWidget( QLabel( 'seconds' ) )
 		h.addWidget( self.solveButton )
+		h.addWidget( self.cancelButton )
 		h.addStretch(1)
 		vbox.addLayout(h)
 
@@ -480,6 +664,7 @@ class Proj5GUI( QMainWindow ):
 
 		self.lastPath = (None,None)
 		self.solveButton.setEnabled(False)
+		self.cancelButton.setEnabled(False)
 
 		self.curSeed.textChanged.connect(self.checkGenInputs)
 		self.size.textChanged.connect(self.checkGenInputs)
@@ -487,6 +672,7 @@ class Proj5GUI( QMainWindow ):
 		self.randSeedButton.clicked.connect(self.randSeedClicked)
 		self.generateButton.clicked.connect(self.generateClicked)
 		self.solveButton.clicked.connect(self.solveClicked)
+		self.cancelButton.clicked.connect(self.cancelClicked)
 
 		self.diffDropDown.addItem('Easy                               ')					# Weird hack to make box wide enough to show all of last item
 		self.diffDropDown.addItem('Normal')
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+
+''' <summary>
+	Headless batch runner: generates scenarios exactly the way Proj5GUI does
+	(newPoints + Scenario) for every size / seed / difficulty asked for, runs
+	the chosen TSPSolver entry points on each one and writes one row of
+	results-dict fields per run as CSV or JSON.
+
+	    python3 TSPBatch.py --sizes 20 100 --seeds 1 2 3 --difficulties Easy Hard \
+	        --algorithms greedy branchAndBound --time-limit 10 --output results.csv
+
+	Solver options go through --option ALGORITHM.NAME=VALUE (VALUE is a Python
+	literal), e.g. --option branchAndBound.bound='assignment'.  Hard scenarios
+	are thinned the GUI's way unless --thin-edges-version 2 asks for the
+	vectorized thinning (much faster on big scenarios, different edges).
+	</summary>
+'''
+
+import argparse
+import ast
+import csv
+import json
+import math
+import random
+import sys
+import numpy as np
+
+from TSPClasses import Scenario
+from TSPProfile import Profiler
+from TSPSolver import TSPSolver
+
+
+# Same map as Proj5GUI's data_range (SCALE = 1.0)
+DATA_RANGE = {'x': [-1.5, 1.5], 'y': [-1.0, 1.0]}
+
+DIFFICULTIES = ('Easy', 'Normal', 'Hard', 'Hard (Deterministic)')
+
+ALGORITHMS = ('defaultRandomTour', 'greedy', 'branchAndBound', 'heldKarp', 'fancy', 'localSearch',
+              'linKernighan')
+
+# Columns of the CSV output: what was run, then the results-dict fields
+FIELDS = ('algorithm', 'size', 'seed', 'difficulty', 'thin_edges_version', 'time_limit', 'cost', 'time', 'count', 'max', 'total',
+          'pruned')
+
+
+# The GUI's newPoints: npoints uniform points on the map from random.seed(seed)
+def newPoints(npoints, seed, data_range=DATA_RANGE):
+    random.seed(seed)
+    xr, yr = data_range['x'], data_range['y']
+    points = []
+    while len(points) < npoints:
+        x = random.uniform(0.0, 1.0)
+        y = random.uniform(0.0, 1.0)
+        points.append((xr[0] + (xr[1] - xr[0]) * x, yr[0] + (yr[1] - yr[0]) * y))
+    return points
+
+
+''' <summary>
+	The scenario the GUI would generate for this size, seed and difficulty.
+	np.random is seeded too (the GUI leaves it alone), so that Hard mode's
+	removed edges are the same from one run to the next.  thin_edges_version
+	picks Scenario.thinEdges' version (default: Scenario.THIN_EDGES_VERSION).
+	</summary>
+'''
+
+def generateScenario(npoints, difficulty, seed, thin_edges_version=None):
+    np.random.seed(seed)
+    return Scenario(newPoints(npoints, seed), difficulty, seed, thin_edges_version=thin_edges_version)
+
+
+# One solver run with random and np.random seeded first; the results dict without the solution
+def runSolver(solver, algorithm, time_limit, seed, options=None):
+    random.seed(seed)
+    np.random.seed(seed)
+    results = getattr(solver, algorithm)(time_allowance=time_limit, **(options or {}))
+    return {key: value for key, value in results.items() if key != 'soln'}
+
+
+''' <summary>
+	Runs every algorithm on every (size, seed, difficulty) scenario, each run
+	starting from random and np.random seeded with the scenario's seed.
+	thin_edges_version goes to generateScenario.  options maps an algorithm
+	name to extra keyword arguments for it; with profile (True or a
+	TSPProfile.Profiler) every run is instrumented.
+	</summary>
+	<returns>a generator of result rows: the FIELDS plus every other
+	results-dict entry except the solution itself.</returns>
+'''
+
+def runBatch(sizes, seeds, difficulties, algorithms, time_limit, options=None, profile=False,
+             thin_edges_version=None):
+    options = options or {}
+    thin_edges_version = thin_edges_version or Scenario.THIN_EDGES_VERSION
+    solver = TSPSolver(None, profile=profile)
+    for size in sizes:
+        for seed in seeds:
+            for difficulty in difficulties:
+                solver.setupWithScenario(generateScenario(size, difficulty, seed, thin_edges_version))
+                for algorithm in algorithms:
+                    row = {'algorithm': algorithm, 'size': size, 'seed': seed, 'difficulty': difficulty,
+                           'thin_edges_version': thin_edges_version, 'time_limit': time_limit}
+                    row.update(runSolver(solver, algorithm, time_limit, seed, options.get(algorithm)))
+                    yield row
+
+
+# Plain Python value for output (numpy scalars unwrapped; in JSON infinity becomes null)
+def _plain(value, finite=False):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, dict):
+        return {key: _plain(item, finite) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item, finite) for item in value]
+    if finite and isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def writeCsv(rows, stream):
+    writer = csv.DictWriter(stream, fieldnames=FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({key: _plain(row.get(key)) for key in FIELDS})
+        stream.flush()
+
+
+def writeJson(rows, stream):
+    json.dump([{key: _plain(value, finite=True) for key, value in row.items()} for row in rows], stream, indent=1)
+    stream.write('\n')
+
+
+# --option ALGORITHM.NAME=VALUE strings as {algorithm: {name: value}}
+def parseOptions(specs):
+    options = {}
+    for spec in specs:
+        target, _, value = spec.partition('=')
+        algorithm, _, name = target.partition('.')
+        if not (value and name):
+            raise ValueError('Bad --option {!r}: expected ALGORITHM.NAME=VALUE'.format(spec))
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass  # a bare word is taken as a string
+        options.setdefault(algorithm, {})[name] = value
+    return options
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run TSP solvers on generated scenarios without the GUI.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[15], help='numbers of cities')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[20], help='random seeds')
+    parser.add_argument('--difficulties', nargs='+', default=['Hard (Deterministic)'], choices=DIFFICULTIES)
+    parser.add_argument('--algorithms', nargs='+', default=['greedy'], choices=ALGORITHMS)
+    parser.add_argument('--time-limit', type=float, default=60.0, help='seconds per run')
+    parser.add_argument('--thin-edges-version', type=int, choices=(1, 2), default=Scenario.THIN_EDGES_VERSION,
+                        help='how Hard scenarios lose edges (default: %(default)s, as in the GUI)')
+    parser.add_argument('--option', action='append', default=[], metavar='ALGORITHM.NAME=VALUE',
+                        help='extra keyword argument for one algorithm (repeatable)')
+    parser.add_argument('--profile', action='store_true',
+                        help='instrument the solvers (the profile field is only written as JSON)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='with --profile, trace allocations for an exact peak memory (several times slower)')
+    parser.add_argument('--format', choices=('csv', 'json'), help='default: from --output, else csv')
+    parser.add_argument('--output', help='file to write (default: standard output)')
+    args = parser.parse_args(argv)
+    try:
+        options = parseOptions(args.option)
+    except ValueError as error:
+        parser.error(str(error))
+
+    output_format = args.format or ('json' if (args.output or '').endswith('.json') else 'csv')
+    rows = runBatch(args.sizes, args.seeds, args.difficulties, args.algorithms, args.time_limit, options,
+                    Profiler(trace_memory=args.trace_memory) if args.profile else False, args.thin_edges_version)
+    stream = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if output_format == 'json':
+            writeJson(rows, stream)
+        else:
+            writeCsv(rows, stream)
+    finally:
+        if args.output:
+            stream.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+
+''' <summary>
+	Fixed-seed regression benchmark: every TSPSolver entry point on a fixed
+	matrix of GUI-generated scenarios (see TSPBatch), recording cost, wall
+	time, states per second and peak memory, and comparing them with a stored
+	baseline.
+
+	    python3 TSPBenchmark.py --save-baseline     # record the baseline
+	    python3 TSPBenchmark.py                     # compare against it
+
+	Exits with status 1 if any run regressed past the tolerances.
+	</summary>
+'''
+
+import argparse
+import json
+import math
+import multiprocessing
+import statistics
+import sys
+
+from TSPBatch import ALGORITHMS, DIFFICULTIES, generateScenario, runSolver, writeJson
+from TSPProfile import peakResident
+from TSPSolver import TSPSolver
+
+
+SIZES = (10, 20, 100, 1000, 10000)
+
+SEEDS = (1, 2, 3)
+
+TIME_LIMIT = 10.0
+
+# Times each run is repeated; the compared metrics are the medians of the repeats
+REPEATS = 3
+
+# Hard scenarios are thinned with the vectorized version 2 of
+# Scenario.thinEdges: version 1 takes about 45 s per 10k-city scenario
+THIN_EDGES_VERSION = 2
+
+# Largest size each algorithm is benchmarked at: past these Held-Karp refuses
+# to start and branch and bound or the genetic search run out of memory
+MAX_SIZES = {'heldKarp': 20, 'branchAndBound': 100, 'fancy': 1000}
+
+BASELINE = 'benchmark_baseline.json'
+
+# How much worse than the baseline a run may be (as a fraction) before it is
+# flagged: wide enough for a busy machine and for the randomized solvers,
+# whose cost under a time limit depends on how far they got
+TOLERANCES = {'cost': 0.05, 'time': 0.5, 'states_per_sec': 0.5, 'peak_memory': 0.25}
+
+# Memory differences below this are noise
+MEMORY_SLACK = 1 << 20
+
+# Runs shorter than this (seconds) are too noisy to compare time or speed
+MIN_TIMED = 0.1
+
+# What identifies a run in the baseline
+KEY = ('algorithm', 'size', 'seed', 'difficulty', 'thin_edges_version')
+
+_FORK = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+
+
+''' <summary>
+	Runs the benchmark matrix, skipping algorithms past their MAX_SIZES.
+	Hard scenarios are thinned with thin_edges_version (see TSPBatch).
+	Where fork is available each run happens in a child process (sharing
+	the already generated scenario and cost matrix), so that its peak
+	memory is its own: the growth of the child's peak resident set.  Every
+	run is done repeats times (see _medianRow).
+	</summary>
+	<returns>a generator of TSPBatch rows with states_per_sec (total / time),
+	peak_memory (bytes, None where it cannot be measured) and repeats
+	added.</returns>
+'''
+
+def runBenchmark(sizes=SIZES, seeds=SEEDS, difficulties=DIFFICULTIES, algorithms=ALGORITHMS,
+                 time_limit=TIME_LIMIT, thin_edges_version=THIN_EDGES_VERSION, repeats=REPEATS):
+    solver = TSPSolver(None)
+    for size in sizes:
+        for seed in seeds:
+            for difficulty in difficulties:
+                wanted = [algorithm for algorithm in algorithms if size <= MAX_SIZES.get(algorithm, size)]
+                if not wanted:
+                    continue
+                scenario = generateScenario(size, difficulty, seed, thin_edges_version)
+                scenario.getCosts()
+                solver.setupWithScenario(scenario)
+                for algorithm in wanted:
+                    row = {'algorithm': algorithm, 'size': size, 'seed': seed, 'difficulty': difficulty,
+                           'thin_edges_version': thin_edges_version, 'time_limit': time_limit}
+                    runs = []
+                    for _ in range(repeats):
+                        run = _measuredRun(solver, algorithm, time_limit, seed)
+                        total, elapsed = run.get('total'), run.get('time')
+                        run['states_per_sec'] = total / elapsed if total is not None and elapsed else None
+                        runs.append(run)
+                    row.update(_medianRow(runs))
+                    yield row
+
+
+# The repeat with the median time, with the median of each compared metric
+# over the repeats that measured it (a failed repeat counts as infinite cost)
+def _medianRow(runs):
+    runs = sorted(runs, key=lambda run: math.inf if run.get('time') is None else run['time'])
+    row = dict(runs[(len(runs) - 1) // 2])
+    for metric in TOLERANCES:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        row[metric] = statistics.median_low(values) if values else None
+    row['repeats'] = len(runs)
+    return row
+
+
+def _measuredRun(solver, algorithm, time_limit, seed):
+    if _FORK is None or peakResident() is None:
+        results = runSolver(solver, algorithm, time_limit, seed)
+        results['peak_memory'] = None
+        return results
+    reader, writer = _FORK.Pipe(duplex=False)
+    child = _FORK.Process(target=_childRun, args=(writer, solver, algorithm, time_limit, seed))
+    child.start()
+    writer.close()
+    try:
+        results = reader.recv()
+    except EOFError:
+        results = None
+    child.join()
+    if results is None:
+        # Killed (e.g. out of memory) or crashed: no tour, and that counts as a regression
+        return {'cost': math.inf, 'time': None, 'peak_memory': None, 'error': 'exit code {}'.format(child.exitcode)}
+    return results
+
+
+def _childRun(writer, solver, algorithm, time_limit, seed):
+    start = peakResident()
+    results = runSolver(solver, algorithm, time_limit, seed)
+    results['peak_memory'] = peakResident() - start
+    writer.send(results)
+    writer.close()
+
+
+''' <summary>
+	Compares benchmark rows with baseline rows of the same KEY.  A run
+	regresses if it lost a tour the baseline found, its cost or time or peak
+	memory grew by more than its tolerance, or its states per second fell by
+	more than its tolerance.  Time and speed are only compared for baseline
+	runs of at least MIN_TIMED seconds, and time only for those that finished
+	before their time limit.
+	</summary>
+	<returns>list of (row, metric, value, baseline value) per regression.</returns>
+'''
+
+def compareToBaseline(rows, baseline, tolerances=TOLERANCES):
+    previous = {tuple(row.get(key) for key in KEY): row for row in baseline}
+    regressions = []
+    for row in rows:
+        old = previous.get(tuple(row.get(key) for key in KEY))
+        if old is None:
+            continue
+        cost, old_cost = _cost(row), _cost(old)
+        if cost > old_cost * (1 + tolerances['cost']):
+            regressions.append((row, 'cost', cost, old_cost))
+        timed = _number(row, 'time') and _number(old, 'time') and old['time'] >= MIN_TIMED
+        if timed and old['time'] < 0.9 * old['time_limit'] and row['time'] > old['time'] * (1 + tolerances['time']):
+            regressions.append((row, 'time', row['time'], old['time']))
+        if timed and _number(row, 'states_per_sec') and _number(old, 'states_per_sec') \
+                and row['states_per_sec'] * (1 + tolerances['states_per_sec']) < old['states_per_sec']:
+            regressions.append((row, 'states_per_sec', row['states_per_sec'], old['states_per_sec']))
+        if _number(row, 'peak_memory') and _number(old, 'peak_memory') \
+                and row['peak_memory'] > old['peak_memory'] * (1 + tolerances['peak_memory']) + MEMORY_SLACK:
+            regressions.append((row, 'peak_memory', row['peak_memory'], old['peak_memory']))
+    return regressions
+
+
+# Tour cost, with no tour (null in JSON) as infinity
+def _cost(row):
+    return math.inf if row.get('cost') is None else row['cost']
+
+
+def _number(row, key):
+    return row.get(key) is not None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the fixed-seed TSP benchmark and compare it with a baseline.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--seeds', type=int, nargs='+', default=list(SEEDS))
+    parser.add_argument('--difficulties', nargs='+', default=list(DIFFICULTIES), choices=DIFFICULTIES)
+    parser.add_argument('--algorithms', nargs='+', default=list(ALGORITHMS), choices=ALGORITHMS)
+    parser.add_argument('--time-limit', type=float, default=TIME_LIMIT, help='seconds per run')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='times each run is repeated')
+    parser.add_argument('--thin-edges-version', type=int, choices=(1, 2), default=THIN_EDGES_VERSION,
+                        help='how Hard scenarios lose edges (default: %(default)s)')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline JSON file (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the new baseline')
+    parser.add_argument('--output', help='also write this run to a JSON file')
+    args = parser.parse_args(argv)
+
+    rows = []
+    for row in runBenchmark(args.sizes, args.seeds, args.difficulties, args.algorithms, args.time_limit,
+                            args.thin_edges_version, args.repeats):
+        rows.append(row)
+        print('{algorithm:>17} {size:>6} {seed:>3} {difficulty:<20} cost {cost:>10} time {time:>8.3f}s'.format(
+            **dict(row, time=row['time'] or 0.0)), flush=True)
+    for path in (args.output, args.baseline if args.save_baseline else None):
+        if path:
+            with open(path, 'w') as stream:
+                writeJson(rows, stream)
+    if args.save_baseline:
+        return 0
+
+    try:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+    except FileNotFoundError:
+        print('No baseline at {}; run with --save-baseline first'.format(args.baseline))
+        return 0
+    regressions = compareToBaseline(rows, baseline)
+    for row, metric, value, old in regressions:
+        print('REGRESSION {} {} seed {} {}: {} {} (baseline {})'.format(
+            row['algorithm'], row['size'], row['seed'], row['difficulty'], metric, value, old))
+    print('{} runs, {} regressions'.format(len(rows), len(regressions)))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+
+import numpy as np
+from TSPClasses import TSPNode
+
+
+''' <summary>
+	Lower-bounding strategies for branchAndBound.  A strategy builds the root
+	node, gets a popped node ready to be expanded (prepare), builds each child
+	with its lower bound filled in (childNode) and lets go of anything a node
+	no longer needs once it has been expanded (release).
+	</summary>
+'''
+
+
+class ReducedCostBound:
+    # Cost of the path so far plus the reduction of the remaining cost matrix
+    name = 'reduced'
+
+    def rootNode(self, cost_matrix):
+        root = TSPNode(0, np.copy(cost_matrix), [], 0)
+        root.reduceMatrix(0, 0)
+        root.addCityAndUpdateCost(0, cost_matrix)
+        root.compact()
+        return root
+
+    def prepare(self, node, cost_matrix):
+        node.expandMatrix(cost_matrix)
+
+    def childNode(self, node, city, cost_matrix):
+        child = TSPNode(node.lower_bound, np.copy(node.m), node.route.copy(), node.cost,
+                        (node.row_reduction, node.col_reduction))
+        child.addCityAndUpdateCost(city, cost_matrix)
+        child.reduceMatrix(node.city, city)
+        child.compact()
+        return child
+
+    def release(self, node):
+        node.compact()
+
+
+class AssignmentBound:
+    # Cost of the path so far plus the cheapest assignment that gives the last
+    # city and every unvisited city exactly one successor among the unvisited
+    # cities and the start.  It ignores subtours, so it is a relaxation of the
+    # rest of the tour; on asymmetric costs it is usually much tighter than the
+    # reduced-matrix bound, at O(n^3) per node.
+    name = 'assignment'
+
+    def rootNode(self, cost_matrix):
+        root = TSPNode(0, None, [], 0)
+        root.addCityAndUpdateCost(0, cost_matrix)
+        root.lower_bound = self._lowerBound(root, cost_matrix)
+        return root
+
+    def prepare(self, node, cost_matrix):
+        pass
+
+    def childNode(self, node, city, cost_matrix):
+        child = TSPNode(node.lower_bound, None, node.route.copy(), node.cost)
+        child.addCityAndUpdateCost(city, cost_matrix)
+        child.lower_bound = self._lowerBound(child, cost_matrix)
+        return child
+
+    def release(self, node):
+        pass
+
+    def _lowerBound(self, node, cost_matrix):
+        visited = np.zeros(len(cost_matrix), dtype=bool)
+        visited[node.route] = True
+        unvisited = np.flatnonzero(~visited)
+        rows = np.concatenate(([node.city], unvisited))
+        cols = np.concatenate((unvisited, [node.route[0]]))
+        sub = cost_matrix[np.ix_(rows, cols)]
+        if len(unvisited) > 0:
+            sub[0, -1] = np.inf  # can't close the tour before visiting everyone
+        return node.cost + assignmentCost(sub)
+
+
+BOUNDS = {bound.name: bound for bound in (ReducedCostBound, AssignmentBound)}
+
+
+''' <summary>
+	Minimum-cost perfect assignment of a square cost matrix (Hungarian method
+	with potentials, O(n^3), each inner step vectorized over the columns).
+	Missing edges are infinite.
+	</summary>
+	<returns>the cost of the cheapest assignment, or infinity if every
+	assignment has to use a missing edge</returns>
+'''
+
+def assignmentCost(cost):
+    n = cost.shape[0]
+    finite = np.isfinite(cost)
+    if n == 0:
+        return 0.0
+    if not (finite.any(axis=1).all() and finite.any(axis=0).all()):
+        return np.inf
+    # Any assignment through a "big" entry costs more than every all-finite one
+    big = (cost[finite].max() + 1.0) * n
+    a = np.where(finite, cost, big)
+
+    # 1-based as in the textbook version: column 0 is a dummy, p[j] is the row
+    # matched to column j (0 for none), u/v are the row/column potentials
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    p = np.zeros(n + 1, dtype=np.intp)
+    way = np.zeros(n + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            reduced = np.empty(n + 1)
+            reduced[0] = np.inf
+            reduced[1:] = a[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv)
+            minv[better] = reduced[better]
+            way[better] = j0
+            candidates = np.where(free, minv, np.inf)
+            j1 = int(np.argmin(candidates))
+            delta = candidates[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    total = a[p[1:] - 1, np.arange(n)].sum()
+    return np.inf if total >= big else total
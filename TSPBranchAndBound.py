@@ -0,0 +1,221 @@
+#!/usr/bin/python3
+
+import heapq
+import multiprocessing
+import time
+import numpy as np
+
+from TSPBounds import BOUNDS
+from TSPProgress import SharedCancel, pollResults
+
+
+# Subproblems handed out per worker when the tree is split for a parallel run
+SPLIT_FACTOR = 4
+
+
+# Search policies:
+#   ratio  - the original queue order, lower bound / depth (a mix of best- and depth-first)
+#   best   - pure best-first on the lower bound
+#   dive   - depth-first until the first complete tour is reached, then best-first
+#   hybrid - like dive, and again every DIVE_INTERVAL expansions after that
+POLICIES = ('ratio', 'best', 'dive', 'hybrid')
+DIVE_INTERVAL = 1000
+
+# Children bounded between checks of the deadline and cancellation within one
+# expansion (on a big scenario each child copies and reduces the whole matrix)
+CHILD_CHECK = 8
+
+
+def _priority(policy, node):
+    if policy == 'ratio':
+        return node.lower_bound / len(node.route)
+    return node.lower_bound
+
+
+''' <summary>
+	The branch-and-bound search loop.  Expands the given nodes in the order
+	set by policy (see POLICIES) until the queue empties, the deadline passes
+	or, if max_frontier is set, the queue has grown to that many nodes.  While
+	diving, children go on a stack with the best one on top instead of onto
+	the heap, and the dive ends as soon as it reaches a complete tour.  When
+	incumbent (a shared multiprocessing.Value) is given, pruning is done
+	against the best cost any process has found so far and every improvement
+	is published to it.  progress (a TSPProgress.Progress or SharedCancel)
+	hears of every improvement and can stop the search early.  The deadline
+	and progress are also checked every CHILD_CHECK children of an
+	expansion; a node cut short that way goes back on the queue whole.
+	</summary>
+	<returns>dictionary with the best route found (None if nothing beat
+	best_cost) and its cost, the results-dict counters (count, max, max_memory,
+	total, pruned), bounds / bound_time (number of bounds computed and seconds
+	spent on them) and the unexpanded queue as frontier.</returns>
+'''
+
+def branchAndBoundSearch(cost_matrix, bounding, nodes, best_cost, deadline, incumbent=None, max_frontier=None,
+                         policy='ratio', dive_interval=DIVE_INTERVAL, progress=None):
+    stats = {'route': None, 'cost': best_cost, 'count': 0, 'max': 0, 'max_memory': 0,
+             'total': 0, 'pruned': 0, 'bounds': 0, 'bound_time': 0.0}
+    ncities = len(cost_matrix)
+    diving = policy in ('dive', 'hybrid')
+    expansions = 0
+    Q = []
+    stack = []
+    if diving:
+        stack.extend(sorted(nodes, key=lambda node: -node.lower_bound))
+    else:
+        for node in nodes:
+            node.key = _priority(policy, node)
+            Q.append(node)
+        heapq.heapify(Q)
+    queue_bytes = stats['max_memory'] = sum(node.nbytes() for node in nodes)
+
+    while (len(Q) != 0 or len(stack) != 0) and time.time() < deadline:
+        if max_frontier is not None and len(Q) + len(stack) >= max_frontier:
+            break
+        if progress is not None and progress.cancelled():
+            break
+        best = stats['cost'] if incumbent is None else min(stats['cost'], incumbent.value)
+        if diving and len(stack) == 0:
+            diving = False
+        node = stack.pop() if diving else heapq.heappop(Q)
+        queue_bytes -= node.nbytes()
+        if node.lower_bound >= best:
+            # The incumbent improved since this node was queued
+            stats['pruned'] += 1
+            continue
+
+        expansions += 1
+        if policy == 'hybrid' and not diving and expansions % dive_interval == 0:
+            diving = True
+        bounding.prepare(node, cost_matrix)
+        visited = np.zeros(ncities, dtype=bool)
+        visited[node.route] = True
+        children = []
+        reached_tour = False
+        interrupted = False
+
+        for i, dist in enumerate(cost_matrix[node.city]):
+            stats['total'] += 1
+            if dist == np.inf or visited[i]:
+                continue
+
+            if len(node.route) + 1 == ncities:
+                # Complete tour: close it back to the start
+                reached_tour = True
+                cost = node.cost + dist + cost_matrix[i, node.route[0]]
+                if cost < best:
+                    best = stats['cost'] = int(cost)
+                    stats['route'] = node.route + [i]
+                    stats['count'] += 1
+                    if progress is not None:
+                        progress.improved(stats['route'], cost, max=stats['max'], total=stats['total'],
+                                          pruned=stats['pruned'])
+                    if incumbent is not None:
+                        with incumbent.get_lock():
+                            if cost < incumbent.value:
+                                incumbent.value = cost
+            else:
+                if stats['bounds'] % CHILD_CHECK == 0 and (time.time() >= deadline or
+                                                           progress is not None and progress.cancelled()):
+                    interrupted = True
+                    break
+                bound_start = time.time()
+                next_node = bounding.childNode(node, i, cost_matrix)
+                stats['bound_time'] += time.time() - bound_start
+                stats['bounds'] += 1
+
+                if next_node.lower_bound < best:
+                    children.append(next_node)
+                    queue_bytes += next_node.nbytes()
+                else:
+                    stats['pruned'] += 1
+        bounding.release(node)
+        if interrupted:
+            # The children made so far are dropped, so the frontier still covers the tree
+            if diving:
+                stack.append(node)
+            else:
+                node.key = _priority(policy, node)
+                heapq.heappush(Q, node)
+            queue_bytes += node.nbytes()
+            break
+
+        if diving:
+            stack.extend(sorted(children, key=lambda child: -child.lower_bound))
+        else:
+            for child in children:
+                child.key = _priority(policy, child)
+                heapq.heappush(Q, child)
+        if diving and reached_tour:
+            # End of the dive: everything left on the stack joins the heap
+            for child in stack:
+                child.key = _priority(policy, child)
+                heapq.heappush(Q, child)
+            stack = []
+            diving = False
+        stats['max'] = max(stats['max'], len(Q) + len(stack))
+        stats['max_memory'] = max(stats['max_memory'], queue_bytes)
+
+    stats['frontier'] = Q + stack
+    return stats
+
+
+''' <summary>
+	Parallel branch and bound.  The top of the tree is expanded best-first here
+	until there are about SPLIT_FACTOR subproblems per worker; the subproblems are
+	then searched in a process pool that shares the incumbent cost, so every
+	worker prunes against the global best.
+	</summary>
+	<returns>the same dictionary as branchAndBoundSearch (without frontier),
+	merged over the split and all workers: count, total, pruned, bounds and
+	bound_time are summed, max and max_memory are the largest seen by any
+	single search.  With progress, subproblem results are reported as they
+	come in and cancelling it stops the workers too.</returns>
+'''
+
+def parallelBranchAndBound(cost_matrix, bound, root, best_cost, deadline, workers, policy='ratio', progress=None):
+    bounding = BOUNDS[bound]()
+    stats = branchAndBoundSearch(cost_matrix, bounding, [root], best_cost, deadline,
+                                 max_frontier=workers * SPLIT_FACTOR, policy='best', progress=progress)
+    subproblems = stats.pop('frontier')
+    if len(subproblems) == 0 or time.time() >= deadline or progress is not None and progress.cancelled():
+        return stats
+
+    incumbent = multiprocessing.Value('d', stats['cost'])
+    cancel = SharedCancel()
+    with multiprocessing.Pool(workers, initializer=_initWorker,
+                              initargs=(cost_matrix, bound, incumbent, deadline, policy, cancel)) as pool:
+        parts = pool.imap_unordered(_searchSubproblem, subproblems)
+        for part in pollResults(parts, progress, cancel):
+            if part['route'] is not None and part['cost'] < stats['cost']:
+                stats['route'] = part['route']
+                stats['cost'] = part['cost']
+                if progress is not None:
+                    progress.improved(part['route'], part['cost'])
+            for key in ('count', 'total', 'pruned', 'bounds', 'bound_time'):
+                stats[key] += part[key]
+            for key in ('max', 'max_memory'):
+                stats[key] = max(stats[key], part[key])
+    return stats
+
+
+# Per-process state for pool workers, set once by the pool initializer
+_worker = {}
+
+
+def _initWorker(cost_matrix, bound, incumbent, deadline, policy, cancel):
+    _worker['cost_matrix'] = cost_matrix
+    _worker['bounding'] = BOUNDS[bound]()
+    _worker['incumbent'] = incumbent
+    _worker['deadline'] = deadline
+    _worker['policy'] = policy
+    _worker['cancel'] = cancel
+
+
+def _searchSubproblem(node):
+    incumbent = _worker['incumbent']
+    stats = branchAndBoundSearch(_worker['cost_matrix'], _worker['bounding'], [node],
+                                 incumbent.value, _worker['deadline'], incumbent=incumbent,
+                                 policy=_worker['policy'], progress=_worker['cancel'])
+    del stats['frontier']
+    return stats
@@ -6,41 +6,282 @@ import numpy as np
 import random
 import time
 
+from TSPSpatial import SpatialGrid
+
 
 
 class TSPSolution:
-	def __init__( self, listOfCities):
-		self.route = listOfCities
-		self.cost = self._costOfRoute()
-		#print( [c._index for c in listOfCities] )
+	''' <summary>
+		A tour is stored as an array of city indices into its scenario.  It can
+		be built from a list of City objects (the scenario comes from the
+		cities) or directly from indices, in which case the scenario must be
+		passed in.  Pass cost when it is already known to skip the O(n) sum.
+		</summary> '''
+	def __init__( self, listOfCities, scenario=None, cost=None ):
+		if scenario is None:
+			scenario = listOfCities[0]._scenario
+			listOfCities = [c._index for c in listOfCities]
+		self._scenario = scenario
+		self._cost_matrix = scenario.getCosts()
+		self._symmetric = scenario.symmetric_costs
+		self.indices = np.asarray( listOfCities, dtype=np.intp )
+		self._leg_costs = None
+		self._legs = None
+		self.cost = self._costOfRoute() if cost is None else cost
+
+	@property
+	def route( self ):
+		cities = self._scenario.getCities()
+		return [cities[i] for i in self.indices]
+
+	def copy( self ):
+		return TSPSolution( self.indices.copy(), self._scenario, cost=self.cost )
 
 	def _costOfRoute( self ):
-		cost = 0
-		#print('cost = ',cost)
-		last = self.route[0]
-		for city in self.route[1:]:
-			#print('cost increasing by {} for leg {} to {}'.format(last.costTo(city),last._name,city._name))
-			cost += last.costTo(city)
-			last = city
-		#print('cost increasing by {} for leg {} to {}'.format(self.route[-1].costTo(self.route[0]),self.route[-1]._name,self.route[0]._name))
-		cost += self.route[-1].costTo( self.route[0] )
-		#print('cost = ',cost)
-		return cost
+		# Sum every leg (including the one back home) straight out of the cost matrix
+		cost = self._cost_matrix[self.indices, np.roll(self.indices,-1)].sum()
+		return cost if np.isinf(cost) else int(cost)
 
 	def enumerateEdges( self ):
-		elist = []
-		c1 = self.route[0]
-		for c2 in self.route[1:]:
-			dist = c1.costTo( c2 )
-			if dist == np.inf:
-				return None
-			elist.append( (c1, c2, int(math.ceil(dist))) )
-			c1 = c2
-		dist = self.route[-1].costTo( self.route[0] )
-		if dist == np.inf:
+		route = self.route
+		dists = self._cost_matrix[self.indices, np.roll(self.indices,-1)]
+		if np.isinf(dists).any():
+			return None
+		return [ (route[i], route[(i+1)%len(route)], int(math.ceil(dist)))
+				 for i, dist in enumerate(dists) ]
+
+	# enumerateEdges as arrays, for drawing big tours: the from and to city
+	# indices of every leg and its cost rounded up (None on a missing edge)
+	def enumerateEdgeArrays( self ):
+		src = self.indices
+		dst = np.roll(src,-1)
+		dists = self._cost_matrix[src, dst]
+		if np.isinf(dists).any():
 			return None
-		elist.append( (self.route[-1], self.route[0], int(math.ceil(dist))) )
-		return elist
+		return src, dst, np.ceil(dists).astype(np.int64)
+
+	''' <summary>
+		Incremental moves.  Positions are indices into self.indices (the tour
+		wraps around).  Each ...Delta method returns how much the tour cost
+		would change in O(1) without touching the tour, and the matching
+		apply... method performs the move and updates self.cost by that delta.
+		Costs are asymmetric, so every delta uses the direction the edges are
+		actually travelled in.  A delta is infinite if the move would use a
+		missing edge; on a tour that already has a missing edge the apply
+		methods fall back to recomputing the whole cost.
+		</summary> '''
+	def _edgeDelta( self, old_edges, new_edges ):
+		m = self._cost_matrix
+		new_cost = sum( m[a,b] for a,b in new_edges )
+		old_cost = sum( m[a,b] for a,b in old_edges )
+		if np.isinf(old_cost):
+			return np.nan if np.isinf(new_cost) else -np.inf
+		return new_cost - old_cost
+
+	# A missing edge dropped in one part of a move and another added in the other
+	def _addDeltas( self, a, b ):
+		if np.isinf(a) and np.isinf(b) and a != b:
+			return np.nan
+		return a + b
+
+	def _updateCost( self, delta ):
+		if np.isinf(self.cost) or np.isnan(delta):
+			self.cost = self._costOfRoute()
+		else:
+			cost = self.cost + delta
+			self.cost = cost if np.isinf(cost) else int(cost)
+		return delta
+
+	# Exchange the cities at positions i and j
+	def swapDelta( self, i, j ):
+		r = self.indices
+		n = len(r)
+		i, j = i % n, j % n
+		if i == j or n == 2:
+			return 0
+		if (j+1) % n == i:
+			i, j = j, i
+		if (i+1) % n == j:
+			# Adjacent: prev -> a -> b -> next becomes prev -> b -> a -> next
+			a, b = r[i], r[j]
+			prev, nxt = r[i-1], r[(j+1)%n]
+			return self._edgeDelta( [(prev,a),(a,b),(b,nxt)], [(prev,b),(b,a),(a,nxt)] )
+		a, b = r[i], r[j]
+		pa, na = r[i-1], r[(i+1)%n]
+		pb, nb = r[j-1], r[(j+1)%n]
+		return self._edgeDelta( [(pa,a),(a,na),(pb,b),(b,nb)], [(pa,b),(b,na),(pb,a),(a,nb)] )
+
+	def applySwap( self, i, j ):
+		delta = self.swapDelta( i, j )
+		self.indices[[i,j]] = self.indices[[j,i]]
+		self._leg_costs = None
+		self._legs = None
+		return self._updateCost( delta )
+
+	# 2-opt: reverse the stretch of the tour from position i through position j (i < j)
+	def reverseDelta( self, i, j ):
+		r = self.indices
+		n = len(r)
+		if i >= j:
+			return 0
+		a, b = r[i], r[j]
+		prev, nxt = r[i-1], r[(j+1)%n]
+		if j - i + 1 == n:
+			boundary = self._edgeDelta( [(b,a)], [(a,b)] )
+		else:
+			boundary = self._edgeDelta( [(prev,a),(b,nxt)], [(prev,b),(a,nxt)] )
+		return self._addDeltas( boundary, self._reversedLegsDelta( i, j ) )
+
+	def applyReverse( self, i, j ):
+		delta = self.reverseDelta( i, j )
+		r = self.indices
+		r[i:j+1] = r[i:j+1][::-1].copy()
+		if self._leg_costs is not None:
+			# The legs inside the stretch are the same ones run the other way in
+			# reverse order; only the two at its ends are new
+			fwd, bwd = self._leg_costs
+			fwd[i:j], bwd[i:j] = bwd[i:j][::-1].copy(), fwd[i:j][::-1].copy()
+			n = len(r)
+			for p in (i-1, j):
+				a, b = r[p], r[(p+1)%n]
+				fwd[p], bwd[p] = self._cost_matrix[a,b], self._cost_matrix[b,a]
+			self._patchLegSums( i-1, j )
+		return self._updateCost( delta )
+
+	''' <summary>
+		The same 2-opt move as applyReverse( i, j ), except that with symmetric
+		costs the rest of the tour is reversed instead when it is the shorter
+		side (the same cycle, run the other way round), so a move costs at most
+		n/2 steps.
+		</summary>
+		<returns>the positions whose cities changed, as an index array.</returns> '''
+	def applyTwoOpt( self, i, j ):
+		r = self.indices
+		n = len(r)
+		if not self._symmetric or 2 * (j - i + 1) <= n or i >= j:
+			self.applyReverse( i, j )
+			return np.arange( i, j+1 )
+		delta = self.reverseDelta( i, j )
+		changed = np.concatenate( (np.arange( j+1, n ), np.arange( 0, i )) )
+		r[changed] = r[changed[::-1]]
+		self._leg_costs = None
+		self._legs = None
+		self._updateCost( delta )
+		return changed
+
+	# Prefix sums over the legs in both directions, so that the cost change of
+	# travelling r[i..j] backwards is available in O(1) (always 0 with
+	# symmetric costs, which need no sums).  Missing edges are counted
+	# separately so that they never turn a difference into inf - inf.  The
+	# leg costs and sums are patched by the moves (see _patchLegSums).
+	def _reversedLegsDelta( self, i, j ):
+		if self._symmetric:
+			return 0
+		if self._legs is None:
+			if self._leg_costs is None:
+				r = self.indices
+				nxt = np.roll( r, -1 )
+				self._leg_costs = (self._cost_matrix[r, nxt], self._cost_matrix[nxt, r])
+			legs = []
+			for costs in self._leg_costs:
+				missing = np.isinf( costs )
+				legs.append( (np.concatenate( ([0.0], np.cumsum( np.where(missing, 0.0, costs) )) ),
+							  np.concatenate( ([0], np.cumsum( missing )) )) )
+			self._legs = legs
+		(fwd, fwd_missing), (bwd, bwd_missing) = self._legs
+		if bwd_missing[j] - bwd_missing[i] > 0:
+			return np.inf
+		if fwd_missing[j] - fwd_missing[i] > 0:
+			return -np.inf
+		return (bwd[j] - bwd[i]) - (fwd[j] - fwd[i])
+
+	# After the leg costs of legs first..last (leg p runs from position p to
+	# p+1; -1 is the last one, back home) have changed, redo their prefix sums
+	# and shift the ones after them: O(last - first) plus one array add
+	def _patchLegSums( self, first, last ):
+		if self._legs is None:
+			return
+		n = len(self.indices)
+		spans = [(max( first, 0 ), last)] + ([(n-1, n-1)] if first < 0 else [])
+		for (sums, missing), costs in zip( self._legs, self._leg_costs ):
+			for lo, hi in spans:
+				legs = costs[lo:hi+1]
+				gone = np.isinf( legs )
+				new_sums = sums[lo] + np.cumsum( np.where( gone, 0.0, legs ) )
+				new_missing = missing[lo] + np.cumsum( gone )
+				shift, shift_missing = new_sums[-1] - sums[hi+1], new_missing[-1] - missing[hi+1]
+				sums[lo+1:hi+2] = new_sums
+				missing[lo+1:hi+2] = new_missing
+				sums[hi+2:] += shift
+				missing[hi+2:] += shift_missing
+
+	# Leg costs for legs first..last looked up afresh after the cities between them moved
+	def _refreshLegs( self, first, last ):
+		if self._leg_costs is None:
+			return
+		r = self.indices
+		legs = np.arange( first, last+1 )
+		a, b = r[legs], r[(legs+1) % len(r)]
+		fwd, bwd = self._leg_costs
+		fwd[legs], bwd[legs] = self._cost_matrix[a, b], self._cost_matrix[b, a]
+		self._patchLegSums( first, last )
+
+	# Or-opt: move the stretch of length cities starting at position i (it may
+	# not wrap past the end) so that it follows the city at position j.  With
+	# reverse the stretch is put back in the opposite direction.
+	def orOptDelta( self, i, length, j, reverse=False ):
+		r = self.indices
+		n = len(r)
+		last = i + length - 1
+		if i <= j <= last or j == (i-1) % n or length > n - 2:
+			return 0
+		first, end = r[i], r[last]
+		prev, nxt = r[i-1], r[(last+1)%n]
+		after, before = r[j], r[(j+1)%n]
+		if reverse:
+			return self._addDeltas( self._edgeDelta( [(prev,first),(end,nxt),(after,before)],
+													 [(prev,nxt),(after,end),(first,before)] ),
+									self._reversedLegsDelta( i, last ) )
+		return self._edgeDelta( [(prev,first),(end,nxt),(after,before)],
+								[(prev,nxt),(after,first),(end,before)] )
+
+	def applyOrOpt( self, i, length, j, reverse=False ):
+		delta = self.orOptDelta( i, length, j, reverse )
+		r = self.indices
+		last = i + length - 1
+		if not ( i <= j <= last or j == (i-1) % len(r) or length > len(r) - 2 ):
+			# Only the cities from the stretch to j (whichever comes first) move
+			segment = r[i:last+1][::-1] if reverse else r[i:last+1]
+			if j > last:
+				r[i:j+1] = np.concatenate( (r[last+1:j+1], segment) )
+				self._refreshLegs( i-1, j )
+			else:
+				r[j+1:last+1] = np.concatenate( (segment, r[j+1:i]) )
+				self._refreshLegs( j, last )
+		return self._updateCost( delta )
+
+	# Make position i the start of the array (the cycle and its cost are unchanged)
+	def rotate( self, i ):
+		self.indices = np.roll( self.indices, -i )
+		if self._leg_costs is not None:
+			self._leg_costs = tuple( np.roll( costs, -i ) for costs in self._leg_costs )
+		self._legs = None
+
+	# Insertion: move the single city at position i so that it follows position j
+	def insertionDelta( self, i, j ):
+		return self.orOptDelta( i, 1, j )
+
+	def applyInsertion( self, i, j ):
+		return self.applyOrOpt( i, 1, j )
+
+
+# splitmix64 finalizer, on Python ints or on uint64 arrays
+_MASK64 = 2**64 - 1
+
+def _mixBits( x ):
+	x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _MASK64
+	x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _MASK64
+	return x ^ (x >> 31)
 
 
 def nameForInt( num ):
@@ -58,46 +299,223 @@ def nameForInt( num ):
 
 
 
+# x and y arrays for city_locations: Qt points (anything with x() and y()),
+# (x, y) pairs, or an (n, 2) array
+def _cityCoordinates( city_locations ):
+	if len(city_locations) and hasattr( city_locations[0], 'x' ) and callable( city_locations[0].x ):
+		return ( np.array( [pt.x() for pt in city_locations], dtype=float ),
+				 np.array( [pt.y() for pt in city_locations], dtype=float ) )
+	points = np.asarray( city_locations, dtype=float ).reshape( -1, 2 )
+	return points[:,0].copy(), points[:,1].copy()
+
+
 class Scenario:
 
 	HARD_MODE_FRACTION_TO_REMOVE = 0.20 # Remove 20% of the edges
 
-	def __init__( self, city_locations, difficulty, rand_seed ):
+	# Version 1 is the original one-edge-at-a-time thinning (reproduces old
+	# scenarios); version 2 picks all of the edges to remove in one vectorized draw
+	THIN_EDGES_VERSION = 1
+
+	# Above this many cities nothing n x n is stored: costs are computed on
+	# demand (see getCosts) and Hard-mode edges are removed by a hash rule
+	IMPLICIT_COSTS_CITIES = 10000
+
+	def __init__( self, city_locations, difficulty, rand_seed, thin_edges_version=None, implicit_costs=None ):
 		self._difficulty = difficulty
+		self._rand_seed = rand_seed
+		self._thin_edges_version = thin_edges_version or self.THIN_EDGES_VERSION
+
+		# City data lives in parallel arrays; City objects are just views onto a row
+		self._xs, self._ys = _cityCoordinates( city_locations )
+		ncities = len(self._xs)
 
 		if difficulty == "Normal" or difficulty == "Hard":
-			self._cities = [City( pt.x(), pt.y(), \
-								  random.uniform(0.0,1.0) \
-								) for pt in city_locations]
+			self._elevations = np.array( [random.uniform(0.0,1.0) for i in range(ncities)] )
 		elif difficulty == "Hard (Deterministic)":
 			random.seed( rand_seed )
-			self._cities = [City( pt.x(), pt.y(), \
-								  random.uniform(0.0,1.0) \
-								) for pt in city_locations]
+			self._elevations = np.array( [random.uniform(0.0,1.0) for i in range(ncities)] )
 		else:
-			self._cities = [City( pt.x(), pt.y() ) for pt in city_locations]
+			self._elevations = np.zeros( ncities )
+
+		self._names = np.array( [nameForInt( num+1 ) for num in range(ncities)] )
+		self._cities = None
 
+		# Built on first use by getCostMatrix(), getCosts() and getSpatialIndex()
+		self._cost_matrix = None
+		self._implicit_matrix = None
+		self._spatial_index = None
 
-		num = 0
-		for city in self._cities:
-			#if difficulty == "Hard":
-			city.setScenario(self)
-			city.setIndexAndName( num, nameForInt( num+1 ) )
-			num += 1
+		if implicit_costs is None:
+			implicit_costs = ncities > self.IMPLICIT_COSTS_CITIES
+		self.implicit_costs = implicit_costs
 
-		# Assume all edges exists except self-edges
-		ncities = len(self._cities)
-		self._edge_exists = ( np.ones((ncities,ncities)) - np.diag( np.ones((ncities)) ) ) > 0
+		# Only Easy has no elevation and no removed edges, so that c(a,b) == c(b,a)
+		self.symmetric_costs = difficulty == 'Easy'
+
+		# Assume all edges exists except self-edges.  With implicit costs there
+		# is no mask; thinEdges sets up the hash rule instead (see _edgeMask)
+		self._edge_seed = None
+		self._keep_next = None
+		self._edge_exists = None
+		if not implicit_costs:
+			self._edge_exists = ( np.ones((ncities,ncities)) - np.diag( np.ones((ncities)) ) ) > 0
 
 		#print( self._edge_exists )
 		if difficulty == "Hard":
-			self.thinEdges()
+			self.thinEdges(version=self._thin_edges_version)
 		elif difficulty == "Hard (Deterministic)":
-			self.thinEdges(deterministic=True)
+			self.thinEdges(deterministic=True, version=self._thin_edges_version)
 
 	def getCities( self ):
+		if self._cities is None:
+			self._cities = [City( self, i ) for i in range(len(self._xs))]
 		return self._cities
 
+	''' <summary>
+		Dense matrix of City.costTo() values, where entry [i,j] is the cost of
+		going from city i to city j and missing edges (including self-edges)
+		are infinity.  It is built once with array operations the first time
+		it is asked for and cached on the scenario after that.
+		</summary> '''
+	def getCostMatrix( self ):
+		if self._cost_matrix is None:
+			self._cost_matrix = self._buildCostMatrix()
+		return self._cost_matrix
+
+	def _buildCostMatrix( self ):
+		return self.costBlock( slice(None), slice(None) )
+
+	''' <summary>
+		The costs that tours are priced with: the cost matrix, or with implicit
+		costs an ImplicitCostMatrix that looks entries up on demand.  Both
+		answer m[i,j] for single cities and for index arrays.
+		</summary> '''
+	def getCosts( self ):
+		if not self.implicit_costs:
+			return self.getCostMatrix()
+		if self._implicit_matrix is None:
+			self._implicit_matrix = ImplicitCostMatrix( self )
+		return self._implicit_matrix
+
+	''' <summary>
+		Costs from each of the cities in rows (an index array, or a slice) to
+		each of the cities in cols, computed exactly as in the full matrix.
+		</summary> '''
+	def costBlock( self, rows, cols ):
+		everyone = np.arange( len(self._xs) )
+		rows = everyone[rows] if isinstance( rows, slice ) else np.asarray( rows )
+		cols = everyone[cols] if isinstance( cols, slice ) else np.asarray( cols )
+		return self.costPairs( rows[:,np.newaxis], cols[np.newaxis,:] )
+
+	# Cost from each city in src to the matching city in dst (index arrays that broadcast)
+	def costPairs( self, src, dst ):
+		xs, ys, elevations = self._xs, self._ys, self._elevations
+
+		# Rows are the source city, columns the destination (same as costTo)
+		cost = np.sqrt( (xs[dst] - xs[src])**2 + (ys[dst] - ys[src])**2 )
+		if not self._difficulty == 'Easy':
+			cost += elevations[dst] - elevations[src]
+			np.maximum( cost, 0.0, out=cost )
+		cost = np.ceil( cost * City.MAP_SCALE )
+		cost[~self._edgeMask( src, dst )] = np.inf
+		return cost
+
+	''' <summary>
+		Which of the edges src -> dst (index arrays that broadcast) exist.
+		Normally a lookup in _edge_exists; with implicit costs an edge is
+		missing if it is a self-edge, or if a hash of (src, dst, seed) falls
+		in the bottom HARD_MODE_FRACTION_TO_REMOVE of its range and the edge
+		is not on the Hamiltonian cycle kept to guarantee a tour.
+		</summary> '''
+	def _edgeMask( self, src, dst ):
+		if self._edge_exists is not None:
+			return self._edge_exists[src, dst]
+		src, dst = np.asarray( src ), np.asarray( dst )
+		mask = src != dst
+		if self._edge_seed is not None:
+			key = src.astype( np.uint64 ) * np.uint64( len(self._xs) ) + dst.astype( np.uint64 )
+			kept = (_mixBits( key ^ np.uint64( self._edge_seed ) ) >> np.uint64(11)) >= self._edgeThreshold()
+			mask &= kept | (self._keep_next[src] == dst)
+		return mask
+
+	def _edgeExists( self, i, j ):
+		if self._edge_exists is not None:
+			return self._edge_exists[i, j]
+		i, j = int(i), int(j)
+		if i == j:
+			return False
+		if self._edge_seed is None or self._keep_next[i] == j:
+			return True
+		return (_mixBits( (i * len(self._xs) + j) ^ self._edge_seed ) >> 11) >= self._edgeThreshold()
+
+	# Hash values (53 bits) below this remove an edge
+	def _edgeThreshold( self ):
+		return int( self.HARD_MODE_FRACTION_TO_REMOVE * 2**53 )
+
+	# No city at least distance away (in a straight line) from one of rows
+	# costs less than this to get to from it
+	def costLowerBound( self, rows, distance ):
+		climb = 0.0 if self._difficulty == 'Easy' else self._elevations.min() - self._elevations[rows]
+		return np.floor( np.maximum( distance + climb, 0.0 ) * City.MAP_SCALE )
+
+	''' <summary>
+		Grid index over the city coordinates (TSPSpatial.SpatialGrid), built
+		the first time it is asked for.  It backs nearestCities and
+		citiesWithin, so neighbour queries only look at nearby cities instead
+		of whole rows of the cost matrix.
+		</summary> '''
+	def getSpatialIndex( self ):
+		if self._spatial_index is None:
+			self._spatial_index = SpatialGrid( self._xs, self._ys )
+		return self._spatial_index
+
+	''' <summary>
+		The k cheapest destinations out of every city, cheapest first, as an
+		(n, k) array padded with -1 where a city has fewer than k edges (or
+		just the rows for cities, if given).  Each grid cell's cities look at
+		a square of cells around them that doubles in size until no city
+		outside it could be cheaper than their k-th best.  Returns None if
+		the deadline passes first.
+		</summary> '''
+	def nearestCities( self, k, cities=None, deadline=None ):
+		grid = self.getSpatialIndex()
+		ncities = len(self._xs)
+		k = min( k, ncities - 1 )
+		wanted = np.ones( ncities, dtype=bool )
+		if cities is not None:
+			wanted[:] = False
+			wanted[cities] = True
+		nearest = np.full( (ncities, k), -1, dtype=np.intp )
+		for cx, cy, members in grid.occupiedCells():
+			if deadline is not None and time.time() > deadline:
+				return None
+			rows = members[wanted[members]]
+			if len(rows) == 0 or k == 0:
+				continue
+			radius = 1
+			while True:
+				cols = grid.square( cx, cy, radius )
+				costs = self.costBlock( rows, cols )
+				kth = np.partition( costs, k-1, axis=1 )[:,k-1] if len(cols) >= k else np.inf
+				if np.all( kth <= self.costLowerBound( rows, grid.clearance( rows, cx, cy, radius ) ) ):
+					break
+				radius *= 2
+			order = np.argsort( costs, axis=1, kind='stable' )[:,:k]
+			found = np.isfinite( np.take_along_axis( costs, order, axis=1 ) )
+			nearest[rows] = np.where( found, cols[order], -1 )
+		return nearest if cities is None else nearest[cities]
+
+	# Cities within straight-line distance radius of city that it has an edge to, nearest first
+	def citiesWithin( self, city, radius ):
+		grid = self.getSpatialIndex()
+		cx, cy = grid.cellOf( city )
+		cols = grid.square( cx, cy, int(math.ceil( radius / grid.cell )) )
+		dist = np.hypot( self._xs[cols] - self._xs[city], self._ys[cols] - self._ys[city] )
+		keep = (dist <= radius) & self._edgeMask( city, cols )
+		cols, dist = cols[keep], dist[keep]
+		return cols[np.argsort( dist, kind='stable' )]
+
 
 	def randperm( self, n ):				#isn't there a numpy function that does this and even gets called in Solver?
 		perm = np.arange(n)
@@ -108,8 +526,15 @@ class Scenario:
 			perm[randind] = save
 		return perm
 
-	def thinEdges( self, deterministic=False ):
-		ncities = len(self._cities)
+	def thinEdges( self, deterministic=False, version=1 ):
+		if self.implicit_costs:
+			self._thinEdgesHashed( deterministic )
+			return
+		if version == 2:
+			self._thinEdgesVectorized( deterministic )
+			return
+
+		ncities = len(self._xs)
 		edge_count = ncities*(ncities-1) # can't have self-edge
 		num_to_remove = np.floor(self.HARD_MODE_FRACTION_TO_REMOVE*edge_count)
 
@@ -134,6 +559,54 @@ class Scenario:
 			if self._edge_exists[src,dst] and can_delete[src,dst]:
 				self._edge_exists[src,dst] = False
 				num_to_remove -= 1
+		self._cost_matrix = None
+
+	''' <summary>
+		Version 2 of thinEdges: the kept Hamiltonian cycle is protected the same
+		way, but all of the edges to remove are drawn at once, without
+		replacement, from the deletable ones.  In deterministic mode the draw
+		comes from a generator seeded with rand_seed, so a seed always gives
+		the same edges; otherwise it is seeded from np.random.
+		</summary> '''
+	def _thinEdgesVectorized( self, deterministic ):
+		ncities = len(self._xs)
+		edge_count = ncities*(ncities-1) # can't have self-edge
+		num_to_remove = int(np.floor(self.HARD_MODE_FRACTION_TO_REMOVE*edge_count))
+
+		if deterministic:
+			rng = np.random.default_rng( self._rand_seed )
+		else:
+			rng = np.random.default_rng( np.random.randint(2**31) )
+
+		# Set aside a route to ensure at least one tour exists
+		route_keep = rng.permutation( ncities )
+		can_delete = self._edge_exists.copy()
+		can_delete[route_keep, np.roll(route_keep,-1)] = False
+
+		candidates = np.flatnonzero( can_delete )
+		removed = rng.choice( candidates.size, size=num_to_remove, replace=False, shuffle=False )
+		self._edge_exists.flat[candidates[removed]] = False
+		self._cost_matrix = None
+
+	''' <summary>
+		thinEdges with implicit costs: nothing is drawn edge by edge.  A random
+		Hamiltonian cycle is kept (stored as each city's successor on it) and a
+		random 64-bit seed picks the removed edges through _edgeMask, so about
+		HARD_MODE_FRACTION_TO_REMOVE of the edges go missing using O(n) memory.
+		Deterministic mode seeds both from rand_seed.
+		</summary> '''
+	def _thinEdgesHashed( self, deterministic ):
+		ncities = len(self._xs)
+		if deterministic:
+			rng = np.random.default_rng( self._rand_seed )
+		else:
+			rng = np.random.default_rng( np.random.randint(2**31) )
+		route_keep = rng.permutation( ncities )
+		self._keep_next = np.empty( ncities, dtype=np.intp )
+		self._keep_next[route_keep] = np.roll( route_keep, -1 )
+		self._edge_seed = int( rng.integers( 0, 2**63 ) )
+		self._cost_matrix = None
+		self._implicit_matrix = None
 
 		#print( self._edge_exists )
 
@@ -141,20 +614,37 @@ class Scenario:
 
 
 class City:
-	def __init__( self, x, y, elevation=0.0 ):
-		self._x = x
-		self._y = y
-		self._elevation = elevation
-		self._scenario	= None
-		self._index = -1
-		self._name	= None
-
-	def setIndexAndName( self, index, name ):
-		self._index = index
-		self._name = name
+	''' <summary>
+		Lightweight view onto one row of its scenario's city arrays.  Two views
+		of the same row compare equal.
+		</summary> '''
+	__slots__ = ( '_scenario', '_index' )
 
-	def setScenario( self, scenario ):
+	def __init__( self, scenario, index ):
 		self._scenario = scenario
+		self._index = index
+
+	@property
+	def _x( self ):
+		return self._scenario._xs[self._index]
+
+	@property
+	def _y( self ):
+		return self._scenario._ys[self._index]
+
+	@property
+	def _elevation( self ):
+		return self._scenario._elevations[self._index]
+
+	@property
+	def _name( self ):
+		return self._scenario._names[self._index]
+
+	def __eq__( self, other ):
+		return type(other) == City and other._scenario is self._scenario and other._index == self._index
+
+	def __hash__( self ):
+		return hash( (id(self._scenario), self._index) )
 
 	''' <summary>
 		How much does it cost to get from this city to the destination?
@@ -169,7 +659,7 @@ class City:
 
 		# In hard mode, remove edges; this slows down the calculation...
 		# Use this in all difficulties, it ensures INF for self-edge
-		if not self._scenario._edge_exists[self._index, other_city._index]:
+		if not self._scenario._edgeExists( self._index, other_city._index ):
 			#print( 'Edge ({},{}) doesn\'t exist'.format(self._index,other_city._index) )
 			return np.inf
 
@@ -186,49 +676,128 @@ class City:
 
 
 		return int(math.ceil(cost * self.MAP_SCALE))
+''' <summary>
+	Stand-in for the cost matrix of a scenario with implicit costs.  m[i,j]
+	computes the entry when it is asked for, either for one pair of cities or
+	for index arrays (one entry per broadcast pair, as numpy would), so tours
+	and local search can use it exactly like the dense matrix.  Slices and
+	whole rows are not supported; use Scenario.costBlock for those.
+	</summary>
+'''
+
+class ImplicitCostMatrix:
+	def __init__( self, scenario ):
+		self._scenario = scenario
+		ncities = len(scenario._xs)
+		self.shape = (ncities, ncities)
+		# Single entries are worked out in plain Python floats (same IEEE
+		# arithmetic as the array version, without numpy's per-call overhead)
+		self._xs = scenario._xs.tolist()
+		self._ys = scenario._ys.tolist()
+		self._elevations = None if scenario._difficulty == 'Easy' else scenario._elevations.tolist()
+
+	def __len__( self ):
+		return self.shape[0]
+
+	def __getitem__( self, key ):
+		src, dst = key
+		if isinstance( src, (int, np.integer) ) and isinstance( dst, (int, np.integer) ):
+			return self._entry( int(src), int(dst) )
+		return self._scenario.costPairs( np.asarray( src ), np.asarray( dst ) )
+
+	def _entry( self, i, j ):
+		if not self._scenario._edgeExists( i, j ):
+			return math.inf
+		xs, ys = self._xs, self._ys
+		cost = math.sqrt( (xs[j] - xs[i])**2 + (ys[j] - ys[i])**2 )
+		if self._elevations is not None:
+			cost = max( cost + (self._elevations[j] - self._elevations[i]), 0.0 )
+		return float( math.ceil( cost * City.MAP_SCALE ) )
+
+
 class TSPNode:
-    def __init__(self, lower_bound, m, route, parent_cost):
+    def __init__(self, lower_bound, m, route, parent_cost, reductions=None):
         self.route = route
         self.cost = parent_cost
         self.lower_bound = lower_bound
+        self.key = 0
         self.m = m
+        # Running totals of the row and column reductions applied to the
+        # unreduced cost matrix.  Together with the route they are enough to
+        # rebuild m, so nodes waiting on the queue can drop it (see compact).
+        # Nodes made without a matrix (bounds that don't reduce) have none.
+        if reductions is None and m is not None:
+            ncities = np.shape(m)[0]
+            reductions = (np.zeros(ncities), np.zeros(ncities))
+        if reductions is None:
+            self.row_reduction = self.col_reduction = None
+        else:
+            self.row_reduction = reductions[0].copy()
+            self.col_reduction = reductions[1].copy()
         return
 
+    # Queue order; the search sets key from its policy before queueing a node
     def __lt__(self, other):
-        return self.lower_bound / len(self.route) < other.lower_bound / len(other.route)
+        return self.key < other.key
 
     def reduceMatrix(self, c1, c2):
         # inf out the correct col and row. also the individual cell. Update lower bound
+        m = self.m
         if len(self.route) != 0:
             # Add val to lower bound
-            self.lower_bound += self.m[c1][c2]
+            self.lower_bound += m[c1, c2]
             # Remove yx value as well
-            self.m[c2][c1] = np.inf
+            m[c2, c1] = np.inf
             # inf out the correct row/column
-            self.m[c1] = [np.inf] * np.shape(self.m)[0]
-            self.m[:, c2] = [np.inf] * np.shape(self.m)[0]
-
-        # Reduce rows
-        for i, row in enumerate(self.m):
-            if 0 not in row and False in np.isinf(row):
-                min_val = np.min(row)
-                self.m[i] = [x - min_val for x in row]
-                self.lower_bound += min_val
-
-        # Reduce columns
-        for i in range(len(self.m)):
-            col = self.m[:, i]
-            if 0 not in col and False in np.isinf(col):
-                min_val = np.min(col)
-                self.m[:, i] = [x - min_val for x in col]
-                self.lower_bound += min_val
-
-    def addCityAndUpdateCost(self, city):
+            m[c1, :] = np.inf
+            m[:, c2] = np.inf
+
+        # Reduce rows, then columns, in place.  Rows/columns that are all inf
+        # (already used) reduce by 0, and inf - x stays inf.
+        row_min = m.min(axis=1)
+        row_min[np.isinf(row_min)] = 0
+        m -= row_min[:, np.newaxis]
+
+        col_min = m.min(axis=0)
+        col_min[np.isinf(col_min)] = 0
+        m -= col_min[np.newaxis, :]
+
+        self.lower_bound += row_min.sum() + col_min.sum()
+        self.row_reduction += row_min
+        self.col_reduction += col_min
+
+    # Drop the reduced matrix; expandMatrix() can rebuild it exactly
+    def compact(self):
+        self.m = None
+
+    # Rebuild the reduced matrix from the unreduced costs: every finite entry is
+    # the original cost less its row and column reductions, and the rows, columns
+    # and reverse edges used by the route are inf'd out just as reduceMatrix did.
+    def expandMatrix(self, cost_matrix):
+        if self.m is None:
+            m = cost_matrix - self.row_reduction[:, np.newaxis] - self.col_reduction[np.newaxis, :]
+            src = self.route[:-1]
+            dst = self.route[1:]
+            m[src, :] = np.inf
+            m[:, dst] = np.inf
+            m[dst, src] = np.inf
+            self.m = m
+        return self.m
+
+    # Approximate memory held by this node while it waits on the queue
+    def nbytes(self):
+        size = 8 * len(self.route)
+        if self.row_reduction is not None:
+            size += self.row_reduction.nbytes + self.col_reduction.nbytes
+        if self.m is not None:
+            size += self.m.nbytes
+        return size
+
+    def addCityAndUpdateCost(self, city, cost_matrix):
         self.city = city
         self.route.append(city)
 
         if len(self.route) == 1:
             self.cost = 0
         else:
-            self.cost += self.route[-2].costTo(self.city)
-
+            self.cost += cost_matrix[self.route[-2], city]
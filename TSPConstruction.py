@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+
+import time
+import numpy as np
+
+
+# Upper bound on the (start x city) entries swept at once, so that an
+# all-starts run on a big scenario is done in slices instead of one huge array
+BATCH_ELEMENTS = 1 << 22
+
+# Upper bound on the start cities swept at once: a sweep has no finished tour
+# until its last step, so batches stay short enough to keep tours coming in
+BATCH_STARTS = 64
+
+
+''' <summary>
+	Nearest-neighbour construction straight off the cost matrix, run from
+	several start cities at once.  Each step takes the row of every tour's
+	current city, masks the cities that tour has already visited with
+	infinity and moves to the argmin, so one step advances every tour.
+	</summary>
+	<returns>(routes, costs): a (len(starts), n) array of city indices and the
+	cost of each tour.  A tour that dead-ends (or a sweep that runs past the
+	deadline or is cancelled through progress) gets an infinite cost and its
+	route should be ignored.</returns>
+'''
+
+def nearestNeighbourTours(cost_matrix, starts, deadline=None, progress=None):
+    starts = np.asarray(starts, dtype=np.intp)
+    ntours = len(starts)
+    ncities = cost_matrix.shape[0]
+    rows = np.arange(ntours)
+
+    routes = np.empty((ntours, ncities), dtype=np.intp)
+    routes[:, 0] = starts
+    costs = np.zeros(ntours)
+    visited = np.zeros((ntours, ncities))  # 0 or inf, added onto each step's rows
+    visited[rows, starts] = np.inf
+    step_costs = np.empty((ntours, ncities))
+
+    current = starts
+    for step in range(1, ncities):
+        np.take(cost_matrix, current, axis=0, out=step_costs)
+        step_costs += visited
+        nxt = step_costs.argmin(axis=1)
+        costs += step_costs[rows, nxt]
+        visited[rows, nxt] = np.inf
+        routes[:, step] = nxt
+        current = nxt
+        if np.isinf(costs).all() or (deadline is not None and time.time() > deadline) \
+                or (progress is not None and progress.cancelled()):
+            costs[:] = np.inf
+            return routes, costs
+    costs += cost_matrix[current, starts]
+    return routes, costs
+
+
+''' <summary>
+	Nearest-neighbour construction from one start city without the cost
+	matrix: each step looks for the cheapest unvisited city in a square of
+	the scenario's spatial index around the current city, doubling the
+	square until nothing outside it could be cheaper (ties go to the lowest
+	index, as in nearestNeighbourTours, so both give the same tour).  The
+	index is rebuilt over the unvisited cities whenever half of the ones it
+	holds have been visited, so late steps do not wade through dead cells.
+	If the deadline passes (or progress is cancelled) first, the cities
+	still unvisited are added in random order instead (see randomTour), so
+	there is still a tour, just a worse one.
+	</summary>
+	<returns>(route, cost) as in nearestNeighbourTours, for a single tour.</returns>
+'''
+
+def nearestNeighbourTour(scenario, start, deadline=None, progress=None):
+    grid = scenario.getSpatialIndex()
+    ncities = len(grid.cities)
+    unvisited = np.ones(ncities, dtype=bool)
+    unvisited[start] = False
+    route = np.empty(ncities, dtype=np.intp)
+    route[0] = start
+    cost = 0.0
+
+    current = np.intp(start)
+    for step in range(1, ncities):
+        if 2 * (ncities - step) < len(grid.cities):
+            grid = grid.subset(np.flatnonzero(unvisited))
+        if step % 256 == 0 and (deadline is not None and time.time() > deadline
+                                or progress is not None and progress.cancelled()):
+            route = randomTour(scenario.getCosts(), prefix=route[:step])
+            return route, scenario.costPairs(route, np.roll(route, -1)).sum()
+        cx, cy = grid.cellOf(current)
+        radius = 1
+        while True:
+            cols = grid.square(cx, cy, radius)
+            cols = cols[unvisited[cols]]
+            costs = scenario.costBlock([current], cols)[0]
+            best = costs.min() if len(cols) else np.inf
+            reach = grid.clearance(current, cx, cy, radius)
+            if np.isinf(reach) or best < scenario.costLowerBound(current, reach):
+                break
+            radius *= 2
+        if np.isinf(best):
+            return route, np.inf
+        current = cols[costs == best].min()
+        unvisited[current] = False
+        route[step] = current
+        cost += best
+    return route, cost + scenario.costBlock([current], [start])[0, 0]
+
+
+''' <summary>
+	Random tour built only out of existing edges, so Hard mode does not have
+	to reject permutations until one happens to avoid every missing edge.
+	The tour is grown as the front of a shuffled pool of cities: each step
+	takes the first city still in the pool that the current one has an edge
+	to.  On a dead end (or a missing edge back to the start) the last few
+	steps are undone and the rest of the pool reshuffled, backing up twice as
+	far each time until the tour gets past its furthest point again.  With
+	every edge present this is exactly rng.permutation(n).  rng can be a
+	numpy Generator or the np.random module.  With prefix (city indices) the
+	tour starts out as that partial tour and only the other cities are
+	shuffled (dead ends may still back up into it).
+	</summary>
+	<returns>the tour as an array of city indices, or None if the deadline
+	passed first.</returns>
+'''
+
+def randomTour(costs, rng=np.random, deadline=None, prefix=None):
+    ncities = len(costs)
+    if prefix is None:
+        pool = rng.permutation(ncities).tolist()
+        depth = 1
+    else:
+        rest = np.ones(ncities, dtype=bool)
+        rest[prefix] = False
+        pool = np.asarray(prefix).tolist() + rng.permutation(np.flatnonzero(rest)).tolist()
+        depth = max(len(prefix), 1)
+    if ncities < 2:
+        return np.array(pool, dtype=np.intp)
+
+    deepest = depth
+    back = 1
+    stuck = 0
+    while True:
+        if depth == ncities:
+            if costs[pool[-1], pool[0]] < np.inf:
+                return np.array(pool, dtype=np.intp)
+        else:
+            current = pool[depth - 1]
+            nxt = next((t for t in range(depth, ncities) if costs[current, pool[t]] < np.inf), None)
+            if nxt is not None:
+                pool[depth], pool[nxt] = pool[nxt], pool[depth]
+                depth += 1
+                if depth > deepest:
+                    deepest, back = depth, 1
+                continue
+
+        stuck += 1
+        if deadline is not None and stuck % 64 == 0 and time.time() > deadline:
+            return None
+        depth = max(depth - back, 1)
+        tail = pool[depth:]
+        rng.shuffle(tail)
+        pool[depth:] = tail
+        back = min(2 * back, ncities)
+
+
+# count tours from randomTour as the rows of an array (fewer if the deadline passes)
+def randomTours(costs, count, rng=np.random, deadline=None):
+    tours = []
+    for _ in range(count):
+        tour = randomTour(costs, rng, deadline)
+        if tour is None:
+            break
+        tours.append(tour)
+    return np.array(tours, dtype=np.intp).reshape(len(tours), len(costs))
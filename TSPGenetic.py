@@ -0,0 +1,278 @@
+#!/usr/bin/python3
+
+import multiprocessing
+import time
+import numpy as np
+
+from TSPConstruction import nearestNeighbourTours, randomTours
+from TSPProgress import SharedCancel, pollResults
+
+
+''' <summary>
+	Genetic algorithm over a whole population at once.  The population is a
+	(population_size, n) int32 matrix with one tour (a permutation of the city
+	indices) per row, and every generation works on all rows together:
+	fitness is one fancy-indexed gather from the cost matrix, parents come
+	from tournament selection, children from a vectorized permutation
+	crossover (CROSSOVERS) plus inversion mutation, and the elite best tours
+	carry over unchanged.  Tours that use a missing edge cost infinity and so
+	never win a tournament against a valid one.
+	</summary>
+'''
+
+class GeneticAlgorithm:
+    def __init__(self, cost_matrix, population_size=50, crossover='ox', tournament_size=3,
+                 elite=2, mutation_rate=0.3, rng=None):
+        self._cost_matrix = cost_matrix
+        self.population_size = population_size
+        self._crossover = CROSSOVERS[crossover]
+        self.tournament_size = tournament_size
+        self.elite = min(elite, population_size - 1)
+        self.mutation_rate = mutation_rate
+        self._rng = rng if rng is not None else np.random.default_rng()
+
+        self.population = None
+        self.costs = None
+        self.best_tour = None
+        self.best_cost = np.inf
+        self.generations = 0
+        self.children = 0
+        self.improvements = 0
+        self.rejected = 0
+
+    def fitness(self, population):
+        # One flat gather of every leg (i -> next) of every tour
+        ncities = self._cost_matrix.shape[1]
+        legs = population.astype(np.intp) * ncities
+        legs[:, :-1] += population[:, 1:]
+        legs[:, -1] += population[:, 0]
+        return self._cost_matrix.take(legs).sum(axis=1)
+
+    def initialize(self, population):
+        self.population = np.asarray(population, dtype=np.int32)
+        self.costs = self.fitness(self.population)
+        self._updateBest()
+
+    def step(self):
+        rng = self._rng
+        nchildren = self.population_size - self.elite
+        npairs = (nchildren + 1) // 2
+
+        # Tournament selection: the cheapest of tournament_size random entrants
+        entrants = rng.integers(0, len(self.population), size=(2 * npairs, self.tournament_size))
+        winners = entrants[np.arange(2 * npairs), np.argmin(self.costs[entrants], axis=1)]
+        mothers, fathers = winners[:npairs], winners[npairs:]
+
+        # Each pair gives two children, one with each parent as the "first" one
+        children = self._crossover(self.population[np.concatenate((mothers, fathers))],
+                                   self.population[np.concatenate((fathers, mothers))], rng)
+        mutants = rng.random(len(children)) < self.mutation_rate
+        children[mutants] = invert(children[mutants], rng)
+        children = children[:nchildren]
+        child_costs = self.fitness(children)
+
+        # Children worse than both of their parents
+        parent_costs = np.maximum(self.costs[mothers], self.costs[fathers])
+        self.rejected += int((child_costs > np.concatenate((parent_costs, parent_costs))[:nchildren]).sum())
+        self.children += nchildren
+
+        elite = np.argsort(self.costs, kind='stable')[:self.elite]
+        self.population = np.concatenate((self.population[elite], children))
+        self.costs = np.concatenate((self.costs[elite], child_costs))
+        self.generations += 1
+        self._updateBest()
+
+    # Evolves until the deadline, max_generations or progress (see TSPProgress) is cancelled,
+    # reporting every new best tour to progress
+    def run(self, deadline, max_generations=None, progress=None):
+        while time.time() < deadline and (max_generations is None or self.generations < max_generations):
+            if progress is not None and progress.cancelled():
+                break
+            improvements = self.improvements
+            self.step()
+            if progress is not None and self.improvements > improvements:
+                progress.improved(self.best_tour, self.best_cost, max=self.generations, total=self.children,
+                                  pruned=self.rejected)
+
+    # Replace the worst tour in the population with a migrant from another island
+    def immigrate(self, tour, cost):
+        worst = int(np.argmax(self.costs))
+        if cost < self.costs[worst]:
+            self.population[worst] = tour
+            self.costs[worst] = cost
+            self._updateBest()
+            return True
+        return False
+
+    def _updateBest(self):
+        best = int(np.argmin(self.costs))
+        if self.costs[best] < self.best_cost:
+            self.best_cost = self.costs[best]
+            self.best_tour = self.population[best].copy()
+            self.improvements += 1
+
+
+# Generations an island runs between migrations
+MIGRATION_INTERVAL = 50
+
+
+''' <summary>
+	Island model: one GeneticAlgorithm per process in a pool, all running
+	until the same deadline.  Every MIGRATION_INTERVAL generations an island
+	publishes its best tour to a shared-memory table (one row per island) and
+	takes the best tour of the island before it in the ring as a migrant,
+	which replaces its worst tour if it is better.  seed makes the islands'
+	random streams reproducible.  With progress, the best published tour is
+	reported while the islands run and cancelling it stops them all.
+	</summary>
+	<returns>one dictionary per island with its best_tour, best_cost,
+	generations, children, rejected, improvements and migrations.</returns>
+'''
+
+def islandGeneticAlgorithm(cost_matrix, islands, deadline, seed, population_size=50, crossover='ox',
+                           migration_interval=MIGRATION_INTERVAL, progress=None):
+    ncities = len(cost_matrix)
+    tours = multiprocessing.Array('i', islands * ncities)
+    costs = multiprocessing.Array('d', [np.inf] * islands, lock=False)
+    seeds = np.random.SeedSequence(seed).spawn(islands)
+    cancel = SharedCancel()
+    settings = {'population_size': population_size, 'crossover': crossover,
+                'migration_interval': migration_interval}
+
+    def reportBest():
+        with tours.get_lock():
+            best = int(np.argmin(costs))
+            tour = np.frombuffer(tours.get_obj(), dtype=np.int32)[best * ncities:(best + 1) * ncities].copy()
+            cost = costs[best]
+        if cost < np.inf:
+            progress.improved(tour, cost)
+
+    with multiprocessing.Pool(islands, initializer=_initIsland,
+                              initargs=(cost_matrix, tours, costs, seeds, deadline, cancel, settings)) as pool:
+        return list(pollResults(pool.imap(_runIsland, range(islands)), progress, cancel, reportBest))
+
+
+# Per-process state for island workers, set once by the pool initializer
+_island = {}
+
+
+def _initIsland(cost_matrix, tours, costs, seeds, deadline, cancel, settings):
+    _island.update(settings)
+    _island['cost_matrix'] = cost_matrix
+    _island['tours'] = tours
+    _island['costs'] = costs
+    _island['seeds'] = seeds
+    _island['deadline'] = deadline
+    _island['cancel'] = cancel
+
+
+def _runIsland(island):
+    cost_matrix = _island['cost_matrix']
+    deadline = _island['deadline']
+    islands = len(_island['seeds'])
+    rng = np.random.default_rng(_island['seeds'][island])
+    ga = GeneticAlgorithm(cost_matrix, population_size=_island['population_size'],
+                          crossover=_island['crossover'], rng=rng)
+    ga.initialize(initialPopulation(cost_matrix, _island['population_size'], rng))
+
+    lock = _island['tours'].get_lock()
+    tours = np.frombuffer(_island['tours'].get_obj(), dtype=np.int32).reshape(islands, -1)
+    costs = _island['costs']
+    source = (island - 1) % islands
+    migrations = 0
+    while time.time() < deadline and not _island['cancel'].cancelled():
+        ga.run(deadline, max_generations=ga.generations + _island['migration_interval'], progress=_island['cancel'])
+        with lock:
+            if ga.best_cost < costs[island]:
+                tours[island] = ga.best_tour
+                costs[island] = ga.best_cost
+            migrant, migrant_cost = tours[source].copy(), costs[source]
+        if migrant_cost < np.inf and ga.immigrate(migrant, migrant_cost):
+            migrations += 1
+
+    return {'best_tour': ga.best_tour, 'best_cost': ga.best_cost, 'generations': ga.generations,
+            'children': ga.children, 'rejected': ga.rejected, 'improvements': ga.improvements,
+            'migrations': migrations}
+
+
+''' <summary>
+	Starting population: nearest-neighbour tours from distinct random start
+	cities (dead ends dropped), topped up with random tours that only use
+	existing edges (TSPConstruction.randomTours).
+	</summary>
+'''
+
+def initialPopulation(cost_matrix, population_size, rng):
+    ncities = len(cost_matrix)
+    starts = rng.permutation(ncities)[:population_size]
+    routes, costs = nearestNeighbourTours(cost_matrix, starts)
+    routes = routes[np.isfinite(costs)]
+    random_tours = randomTours(cost_matrix, population_size - len(routes), rng)
+    return np.concatenate((routes, random_tours)).astype(np.int32)
+
+
+# Row-wise random segments [lo, hi) as a boolean (rows, n) mask
+def _segments(rows, ncities, rng):
+    a = rng.integers(0, ncities, size=rows)
+    b = rng.integers(0, ncities, size=rows)
+    lo = np.minimum(a, b)[:, np.newaxis]
+    hi = np.maximum(a, b)[:, np.newaxis] + 1
+    positions = np.arange(ncities)[np.newaxis, :]
+    return lo, hi, (positions >= lo) & (positions < hi)
+
+
+''' <summary>
+	Order crossover (OX): each child keeps a random segment of its first
+	parent in place and fills the other positions with the remaining cities
+	in the order they appear in the second parent.
+	</summary>
+'''
+
+def orderCrossover(first, second, rng):
+    rows, ncities = first.shape
+    row_index = np.arange(rows)[:, np.newaxis]
+    lo, hi, segment = _segments(rows, ncities, rng)
+    # in_segment[r, c]: city c is in row r's kept segment
+    in_segment = np.zeros((rows, ncities), dtype=bool)
+    in_segment[row_index, first] = segment
+    child = first.copy()
+    # Both masks have n - segment length entries per row, so row-major
+    # boolean assignment fills each row from its own second parent
+    child[~segment] = second[~in_segment[row_index, second]]
+    return child
+
+
+''' <summary>
+	Partially mapped crossover (PMX): each child takes a random segment from
+	its first parent and everything else from its second parent, following
+	the segment's city-to-city mapping until a duplicated city is resolved.
+	</summary>
+'''
+
+def partiallyMappedCrossover(first, second, rng):
+    rows, ncities = first.shape
+    row_index = np.arange(rows)[:, np.newaxis]
+    lo, hi, segment = _segments(rows, ncities, rng)
+    in_segment = np.zeros((rows, ncities), dtype=bool)
+    in_segment[row_index, first] = segment
+    mapping = np.tile(np.arange(ncities, dtype=first.dtype), (rows, 1))
+    mapping[row_index, first] = np.where(segment, second, mapping[row_index, first])
+
+    child = np.where(segment, first, second)
+    clash = ~segment & in_segment[row_index, child]
+    while clash.any():
+        child = np.where(clash, mapping[row_index, child], child)
+        clash = ~segment & in_segment[row_index, child]
+    return child
+
+
+CROSSOVERS = {'ox': orderCrossover, 'pmx': partiallyMappedCrossover}
+
+
+# Inversion mutation: reverse one random segment in every row
+def invert(tours, rng):
+    rows, ncities = tours.shape
+    lo, hi, segment = _segments(rows, ncities, rng)
+    positions = np.arange(ncities)[np.newaxis, :]
+    order = np.where(segment, lo + hi - 1 - positions, positions)
+    return np.take_along_axis(tours, order, axis=1)
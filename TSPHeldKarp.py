@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+
+import math
+import time
+import numpy as np
+
+
+# Largest DP table (costs plus parent pointers) heldKarp will allocate
+HELD_KARP_MEMORY = 1 << 30
+
+# Bytes per (subset, last city) state: a float64 cost, an int8 parent and the
+# bool np.isinf(dp) takes when counting pruned states
+STATE_BYTES = 10
+
+# Bytes per subset besides its states: the int64 subsets and by_size arrays,
+# the int8 sizes and two int64 temporaries (counting bits, and pruned states)
+SUBSET_BYTES = 8 + 8 + 1 + 16
+
+
+''' <summary>
+	Peak bytes heldKarp allocates for an n-city problem: the DP table, the
+	per-subset arrays and the two float64 (subsets x cities) temporaries of
+	the largest single step (the rows gathered from dp and paths), which
+	covers the subsets of the middle layer that hold one given city.
+	</summary>
+'''
+
+def heldKarpMemory(ncities):
+    others = max(ncities - 1, 0)
+    widest = math.comb(others - 1, (others - 1) // 2) if others else 0
+    return (1 << others) * (others * STATE_BYTES + SUBSET_BYTES) + 2 * widest * others * 8
+
+
+''' <summary>
+	Held-Karp dynamic programming.  Tours start and end at city 0; the state
+	(S, j) is the cheapest path from 0 through every city in the subset S of
+	the other cities, ending at j in S.  Subsets are filled in a layer per
+	size, and within a layer all subsets holding j are done in one array
+	step: dp[S, j] = min over k of dp[S - {j}, k] + cost[k, j].  Costs may be
+	asymmetric and missing edges (infinity) just give unreachable states.
+	Refuses (before allocating anything) if the table would take more than
+	max_memory bytes, and gives up at the deadline or when progress (a
+	TSPProgress.Progress) is cancelled.
+	</summary>
+	<returns>dictionary with the optimal route (None if there is no tour, the
+	table is too big or time ran out) and its cost, the results-dict counters:
+	max (largest layer of subsets), max_memory (peak bytes, see
+	heldKarpMemory), total (states
+	computed) and pruned (states with no path), and status ('solved',
+	'memory', 'timeout' or 'cancelled').</returns>
+'''
+
+def heldKarp(cost_matrix, deadline=None, max_memory=HELD_KARP_MEMORY, progress=None):
+    ncities = len(cost_matrix)
+    others = ncities - 1
+    stats = {'route': None, 'cost': np.inf, 'max': 0, 'max_memory': heldKarpMemory(ncities),
+             'total': 0, 'pruned': 0, 'status': 'solved'}
+    if stats['max_memory'] > max_memory:
+        stats['status'] = 'memory'
+        return stats
+    if others <= 0:
+        stats['route'] = [0] * ncities
+        stats['cost'] = cost_matrix[0, 0] if ncities else np.inf
+        return stats
+
+    # Bit k of a subset is city k + 1; step[k, j] is the cost of going from city k+1 to j+1
+    step = np.asarray(cost_matrix[1:, 1:], dtype=float)
+    nsubsets = 1 << others
+    dp = np.full((nsubsets, others), np.inf)
+    parent = np.full((nsubsets, others), -1, dtype=np.int8)
+    singles = 1 << np.arange(others)
+    dp[singles, np.arange(others)] = cost_matrix[0, 1:]
+
+    subsets = np.arange(nsubsets)
+    sizes = np.zeros(nsubsets, dtype=np.int8)
+    for k in range(others):
+        sizes += (subsets >> k) & 1
+    by_size = np.argsort(sizes, kind='stable')
+    layer_starts = np.searchsorted(sizes[by_size], np.arange(others + 2))
+
+    for size in range(2, others + 1):
+        if deadline is not None and time.time() > deadline:
+            stats['status'] = 'timeout'
+            return stats
+        if progress is not None and progress.cancelled():
+            stats['status'] = 'cancelled'
+            return stats
+        layer = by_size[layer_starts[size]:layer_starts[size + 1]]
+        stats['max'] = max(stats['max'], len(layer))
+        for j in range(others):
+            ending = layer[(layer >> j) & 1 == 1]
+            # Entries for cities not in the smaller subset are infinite already
+            paths = dp[ending ^ (1 << j)] + step[:, j]
+            best = paths.argmin(axis=1)
+            dp[ending, j] = paths[np.arange(len(ending)), best]
+            parent[ending, j] = best
+            stats['total'] += len(ending)
+
+    stats['total'] += others
+    # Every state with its last city outside the subset is infinite by construction
+    stats['pruned'] = int(np.isinf(dp).sum() - (others - sizes.astype(np.intp)).sum())
+    full = nsubsets - 1
+    closing = dp[full] + cost_matrix[1:, 0]
+    last = int(closing.argmin())
+    if np.isinf(closing[last]):
+        return stats
+
+    stats['cost'] = closing[last]
+    route = []
+    subset = full
+    while last >= 0:
+        route.append(last + 1)
+        subset, last = subset ^ (1 << last), int(parent[subset, last])
+    stats['route'] = [0] + route[::-1]
+    return stats
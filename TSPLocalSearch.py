@@ -0,0 +1,260 @@
+#!/usr/bin/python3
+
+import collections
+import time
+import numpy as np
+
+
+# Default size of each city's candidate list
+NEIGHBOURS = 8
+
+# Longest stretch of cities an Or-opt move relocates
+MAX_SEGMENT = 3
+
+# Most 2-opt steps in one Lin-Kernighan move
+LK_DEPTH = 10
+
+# Longest stretch a double-bridge kick moves around
+KICK_SEGMENT = 50
+
+
+''' <summary>
+	Improves a TSPSolution in place with 2-opt, Or-opt and reversed Or-opt
+	(the "or2opt" 3-opt variant) moves, using the O(1) deltas on TSPSolution
+	so asymmetric costs and missing edges are priced correctly.  Each city
+	has a don't-look bit: cities are taken off a work queue and only put
+	back when one of their tour edges changes, and for each city only moves
+	that bring it next to one of its candidates (a row of
+	Scenario.nearestCities, -1 padded) are tried (first improvement
+	wins).  Stops when no city is left to look at or at the deadline.
+	With max_depth each city first tries a Lin-Kernighan move of up to that
+	many steps (see _lkMove).  cities limits the cities looked at to start
+	with (all of them by default).  progress (a TSPProgress.Progress) is
+	told of every improving move and can stop the search early.
+	</summary>
+	<returns>dictionary with moves (improving moves applied) and evaluated
+	(candidate moves priced).</returns>
+'''
+
+def improveTour(solution, candidates, deadline=None, max_segment=MAX_SEGMENT, max_depth=0, cities=None,
+                progress=None):
+    ncities = len(solution.indices)
+    stats = {'moves': 0, 'evaluated': 0}
+    if ncities < 5:
+        return stats
+
+    position = np.empty(ncities, dtype=np.intp)
+    position[solution.indices] = np.arange(ncities)
+    if cities is None:
+        cities = solution.indices
+    queue = collections.deque(int(city) for city in cities)
+    queued = np.zeros(ncities, dtype=bool)
+    queued[cities] = True
+
+    looked = 0
+    while queue:
+        looked += 1
+        if looked % 64 == 0 and (deadline is not None and time.time() > deadline
+                                 or progress is not None and progress.cancelled()):
+            break
+        city = queue.popleft()
+        queued[city] = False
+        touched = _lkMove(solution, position, city, candidates, max_depth, stats) if max_depth else None
+        if touched is None:
+            move = _findMove(solution, position, city, candidates[city], max_segment, stats)
+            if move is None:
+                continue
+
+            kind, args, lo, hi = move
+            # Cities whose tour edges are about to change get looked at again
+            r = solution.indices
+            touched = [r[(p + offset) % ncities] for p in (lo, hi) for offset in (-1, 0, 1)]
+            if kind == 'reverse':
+                changed = solution.applyTwoOpt(*args)
+            else:
+                i, length, j, reverse = args
+                touched += [r[i - 1], r[i], r[i + length - 1], r[(i + length) % ncities], r[j], r[(j + 1) % ncities]]
+                solution.applyOrOpt(i, length, j, reverse)
+                changed = np.arange(lo, hi + 1)
+            position[solution.indices[changed]] = changed
+        stats['moves'] += 1
+        if progress is not None:
+            progress.improved(solution, solution.cost, moves=stats['moves'])
+        # A move on a long tour can take milliseconds (reversals are O(n)), so check after every one
+        if deadline is not None and time.time() > deadline or progress is not None and progress.cancelled():
+            break
+        for other in touched:
+            if not queued[other]:
+                queued[other] = True
+                queue.append(int(other))
+        if not queued[city]:
+            queued[city] = True
+            queue.append(city)
+    return stats
+
+
+# First improving move that puts city next to one of its candidates, as
+# (kind, arguments, first position changed, last position changed)
+def _findMove(solution, position, city, neighbours, max_segment, stats):
+    ncities = len(solution.indices)
+    i = position[city]
+    for other in neighbours:
+        if other < 0:
+            break
+        j = position[other]
+
+        # 2-opt: the four reversals that make city and other adjacent
+        for lo, hi in ((i + 1, j), (j + 1, i), (i, j - 1), (j, i - 1)):
+            if 0 <= lo < hi < ncities and hi - lo + 1 < ncities:
+                stats['evaluated'] += 1
+                if solution.reverseDelta(lo, hi) < 0:
+                    return 'reverse', (lo, hi), lo, hi
+
+        # Or-opt: move the stretch that starts at city to just after other,
+        # or reversed to just before it (so city still leads into other)
+        for length in range(1, max_segment + 1):
+            if i + length > ncities or length > ncities - 3:
+                break
+            for after, reverse in ((j, False), ((j - 1) % ncities, True)):
+                stats['evaluated'] += 1
+                if solution.orOptDelta(i, length, after, reverse) < 0:
+                    lo = min(i, after)
+                    hi = max(i + length - 1, after)
+                    return 'oropt', (i, length, after, reverse), lo, hi
+    return None
+
+
+''' <summary>
+	Lin-Kernighan move from t1 built out of 2-opt steps.  t1's tour edge
+	(t1, t2) is broken and, at each step, t2 is joined to a candidate t3
+	whose predecessor t4 then becomes t1's new successor by reversing the
+	stretch t2..t4.  The candidate with the best c(t4, t3) - c(t2, t3) is
+	taken while the running gain (edges removed minus edges added, not
+	counting the edge back to t1) stays positive, and an edge is never both
+	added and removed in the same move.  Steps are only recorded as flips of
+	positions counted from t1 (see _flipped) until the chain ends; then the
+	steps up to the best gain are applied with TSPSolution.applyReverse and
+	kept only if the exact (possibly asymmetric) cost went down.
+	</summary>
+	<returns>the cities whose tour edges changed, or None if the tour was
+	not improved (and is as it was).</returns>
+'''
+
+def _lkMove(solution, position, t1, candidates, max_depth, stats):
+    # Gains are meaningless around missing edges; leave those tours to _findMove
+    if np.isinf(solution.cost):
+        return None
+    cost_matrix = solution._cost_matrix
+    r = solution.indices
+    ncities = len(r)
+    p = position[t1]
+    t2 = r[(p + 1) % ncities]
+    gain = cost_matrix[t1, t2]
+    flips = []
+    steps = []
+    best_gain, best_steps = 0, 0
+    added = set()
+    removed = {(min(t1, t2), max(t1, t2))}
+    while len(flips) < max_depth:
+        choice, best_score = None, -np.inf
+        for t3 in candidates[t2]:
+            if t3 < 0 or gain - cost_matrix[t2, t3] <= 0:
+                break
+            if t3 == t1 or (min(t2, t3), max(t2, t3)) in removed:
+                continue
+            # t2 is always right after t1, so t3 == t2's successor leaves nothing to reverse
+            k = _flipped((position[t3] - p) % ncities, flips)
+            if k == 2:
+                continue
+            t4 = r[(_flipped(k - 1, flips, undo=True) + p) % ncities]
+            # Stretches already flipped run backwards, so the t4 -> t3 leg may be missing
+            if (min(t3, t4), max(t3, t4)) in added or np.isinf(cost_matrix[t4, t3]):
+                continue
+            stats['evaluated'] += 1
+            score = cost_matrix[t4, t3] - cost_matrix[t2, t3]
+            if score > best_score:
+                choice, best_score = (t3, t4, k), score
+        if choice is None:
+            break
+
+        t3, t4, k = choice
+        flips.append((1, k - 1))
+        steps.append((t2, t3, t4))
+        gain += cost_matrix[t4, t3] - cost_matrix[t2, t3]
+        added.add((min(t2, t3), max(t2, t3)))
+        removed.add((min(t3, t4), max(t3, t4)))
+        t2 = t4
+        if gain - cost_matrix[t1, t4] > best_gain:
+            best_gain, best_steps = gain - cost_matrix[t1, t4], len(flips)
+    if best_steps == 0:
+        return None
+
+    flips = flips[:best_steps]
+    if p + max(hi for lo, hi in flips) >= ncities:
+        # Put t1 at the front so that no flip wraps around the array
+        solution.rotate(p)
+        position[:] = (position - p) % ncities
+        p = 0
+    start_cost = solution.cost
+    for lo, hi in flips:
+        _applyReverse(solution, position, lo + p, hi + p)
+    if not solution.cost < start_cost:
+        for lo, hi in reversed(flips):
+            _applyReverse(solution, position, lo + p, hi + p)
+        return None
+    return [t1] + [city for step in steps[:best_steps] for city in step]
+
+
+# Where position q ends up after the flips (or, with undo, where it came from)
+def _flipped(q, flips, undo=False):
+    for lo, hi in (reversed(flips) if undo else flips):
+        if lo <= q <= hi:
+            q = lo + hi - q
+    return q
+
+
+def _applyReverse(solution, position, lo, hi):
+    solution.applyReverse(lo, hi)
+    position[solution.indices[lo:hi + 1]] = np.arange(lo, hi + 1)
+
+
+''' <summary>
+	Chained Lin-Kernighan: improves the tour with improveTour(max_depth), then
+	until the deadline repeatedly kicks a copy of the best tour with a random
+	double-bridge (two neighbouring stretches of up to KICK_SEGMENT cities
+	swap places), re-optimizes only around the kick and keeps the result if
+	it is cheaper.  rng is a numpy Generator; progress works as for
+	improveTour.
+	</summary>
+	<returns>the best TSPSolution found (solution itself is improved in place
+	by the first pass) and a dictionary with moves, evaluated, restarts (kicks
+	tried) and improvements (kicks kept).</returns>
+'''
+
+def chainedLinKernighan(solution, candidates, deadline, rng, max_depth=LK_DEPTH, max_segment=MAX_SEGMENT,
+                        progress=None):
+    stats = improveTour(solution, candidates, deadline, max_segment, max_depth, progress=progress)
+    stats.update(restarts=0, improvements=0)
+    ncities = len(solution.indices)
+    best = solution
+    if ncities < 8:
+        return best, stats
+
+    kick = min(KICK_SEGMENT, (ncities - 2) // 2)
+    while time.time() < deadline and not (progress is not None and progress.cancelled()):
+        trial = best.copy()
+        first, second = rng.integers(1, kick + 1, size=2)
+        a = int(rng.integers(1, ncities - first - second + 1))
+        b, c = a + first, a + first + second
+        r = trial.indices
+        ends = r[[a - 1, a, b - 1, b, c - 1, c % ncities]]
+        # Double bridge A B C D -> A C B D: the stretch b..c-1 moves to follow a-1
+        trial.applyOrOpt(b, c - b, a - 1)
+        found = improveTour(trial, candidates, deadline, max_segment, max_depth, cities=ends, progress=progress)
+        stats['moves'] += found['moves']
+        stats['evaluated'] += found['evaluated']
+        stats['restarts'] += 1
+        if trial.cost < best.cost:
+            best = trial
+            stats['improvements'] += 1
+    return best, stats
@@ -0,0 +1,227 @@
+#!/usr/bin/python3
+
+import cProfile
+import collections
+import heapq
+import threading
+import time
+import tracemalloc
+import types
+
+try:
+    import resource
+except ImportError:  # not on Windows; reports then go without a peak memory figure
+    resource = None
+
+import TSPBranchAndBound
+import TSPGenetic
+from TSPBounds import AssignmentBound
+from TSPClasses import City, ImplicitCostMatrix, Scenario, TSPNode, TSPSolution
+
+
+# (owner, attribute, section) for every hot path a Profiler times; owner is a
+# class, a module or a dict of functions.  Cost evaluation is computing costs
+# and the places dense cost matrix reads are made: tour costs and move deltas,
+# branch-and-bound path costs, GA fitness.
+HOT_PATHS = (
+    (Scenario, 'costBlock', 'cost evaluation'),
+    (Scenario, 'costPairs', 'cost evaluation'),
+    (ImplicitCostMatrix, '__getitem__', 'cost evaluation'),
+    (City, 'costTo', 'cost evaluation'),
+    (TSPSolution, '_costOfRoute', 'cost evaluation'),
+    (TSPSolution, '_edgeDelta', 'cost evaluation'),
+    (TSPNode, 'addCityAndUpdateCost', 'cost evaluation'),
+    (TSPGenetic.GeneticAlgorithm, 'fitness', 'cost evaluation'),
+    (TSPNode, 'expandMatrix', 'matrix reduction'),
+    (TSPNode, 'reduceMatrix', 'matrix reduction'),
+    (AssignmentBound, '_lowerBound', 'assignment bound'),
+    (TSPGenetic.CROSSOVERS, 'ox', 'crossover'),
+    (TSPGenetic.CROSSOVERS, 'pmx', 'crossover'),
+    (TSPGenetic, 'invert', 'mutation'),
+)
+
+# The heap functions branch and bound calls through its module's heapq
+HEAP_FUNCTIONS = ('heapify', 'heappush', 'heappop')
+
+# Held for a whole profiled run: the wrappers are installed process-wide, so
+# profiled runs on different threads take turns
+_RUN_LOCK = threading.Lock()
+
+
+''' <summary>
+	Opt-in instrumentation for one solver run at a time (see TSPSolver's
+	profile argument).  While a run is measured, the HOT_PATHS functions and
+	the branch-and-bound heap operations are swapped for timing wrappers
+	(only the outermost call of a section is timed, so a section that calls
+	itself is not counted twice), and with cprofile a cProfile.Profile
+	records everything for dumpStats.  The wrappers are on the classes and
+	modules, but only time calls from the thread doing the run: other
+	threads (say the GUI's) go straight through, and a second profiled run
+	waits for the first to finish.  Cost matrix reads made inline in a loop
+	(the branch-and-bound child loop, nearest-neighbour sweeps,
+	Lin-Kernighan gains) are not wrapped and count as time outside the
+	sections.  Peak
+	memory is the growth of the process's peak resident set, which is free
+	to read but only sees a run that goes past the process's earlier peak;
+	with trace_memory tracemalloc tracks the peak of memory allocated
+	exactly, but slows solvers down several times over (and so changes
+	how far a time-limited solve gets).  Nothing is wrapped between runs, so
+	solvers pay nothing unless profiled.  Work done in worker processes
+	(workers > 1, islands > 1) is not seen.
+	</summary>
+'''
+
+class Profiler:
+    def __init__(self, cprofile=False, trace_memory=False):
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.report = None
+        self._stats = None
+        self._sections = None
+        self._depth = None
+
+    ''' <summary>
+		Calls function(*args, **kwargs) under instrumentation.
+		</summary>
+		<returns>the function's result and the profile report: solver (name),
+		time (wall seconds), peak_memory (bytes: how far the peak resident set
+		grew, or with trace_memory the bytes allocated at the peak beyond what
+		was allocated before; None if neither can be measured) and sections,
+		which maps each section to its calls and seconds.</returns>
+	'''
+
+    def run(self, name, function, *args, **kwargs):
+        with _RUN_LOCK:
+            return self._run(name, function, *args, **kwargs)
+
+    def _run(self, name, function, *args, **kwargs):
+        self._sections = collections.defaultdict(lambda: [0, 0.0])
+        self._depth = collections.Counter()
+        restore = self._install(threading.get_ident())
+        memory = _TracedMemory() if self.trace_memory else _ResidentMemory()
+        profile = cProfile.Profile() if self.cprofile else None
+        start_time = time.time()
+        try:
+            if profile is not None:
+                result = profile.runcall(function, *args, **kwargs)
+            else:
+                result = function(*args, **kwargs)
+        finally:
+            elapsed = time.time() - start_time
+            peak = memory.stop()
+            for owner, attribute, original in restore:
+                _setAttribute(owner, attribute, original)
+
+        self._stats = profile
+        self.report = {'solver': name, 'time': elapsed, 'peak_memory': peak,
+                       'sections': {section: {'calls': calls, 'time': seconds}
+                                    for section, (calls, seconds) in sorted(self._sections.items())}}
+        return result, self.report
+
+    # Swaps in wrappers timing the calls made on thread; returns what to put back
+    def _install(self, thread):
+        restore = []
+        for owner, attribute, section in HOT_PATHS:
+            original = _getAttribute(owner, attribute)
+            restore.append((owner, attribute, original))
+            _setAttribute(owner, attribute, self._timed(section, original, thread))
+        heap = types.SimpleNamespace(**{name: self._timed('heap operations', getattr(heapq, name), thread)
+                                        for name in HEAP_FUNCTIONS})
+        restore.append((TSPBranchAndBound, 'heapq', TSPBranchAndBound.heapq))
+        TSPBranchAndBound.heapq = heap
+        return restore
+
+    def _timed(self, section, function, thread):
+        totals, depth = self._sections[section], self._depth
+
+        def timed(*args, **kwargs):
+            if threading.get_ident() != thread:
+                return function(*args, **kwargs)
+            totals[0] += 1
+            if depth[section]:
+                return function(*args, **kwargs)
+            depth[section] += 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                totals[1] += time.perf_counter() - start
+                depth[section] -= 1
+        return timed
+
+    # Writes the last run's cProfile statistics to path (for pstats, snakeviz, ...)
+    def dumpStats(self, path):
+        if self._stats is None:
+            raise ValueError('No cProfile statistics: profile a run with Profiler(cprofile=True) first')
+        self._stats.dump_stats(path)
+
+    ''' <summary>
+		The last run's sections in the folded-stack format flame graph tools
+		(flamegraph.pl, speedscope, ...) read: one "solver;section
+		microseconds" line per section that was entered, plus one for the
+		time outside them.
+		</summary>
+	'''
+
+    def collapsedStacks(self):
+        if self.report is None:
+            return ''
+        name = self.report['solver']
+        lines = []
+        outside = self.report['time']
+        for section, totals in self.report['sections'].items():
+            if totals['calls'] == 0:
+                continue
+            lines.append('{};{} {}'.format(name, section.replace(' ', '_'), int(totals['time'] * 1e6)))
+            outside -= totals['time']
+        lines.append('{} {}'.format(name, max(int(outside * 1e6), 0)))
+        return '\n'.join(lines) + '\n'
+
+
+# Peak memory as the growth of ru_maxrss over a run
+class _ResidentMemory:
+    def __init__(self):
+        self._start = peakResident()
+
+    def stop(self):
+        if self._start is None:
+            return None
+        return peakResident() - self._start
+
+
+# This process's peak resident set so far in bytes (None where it cannot be read)
+def peakResident():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS, where this overstates)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Peak memory allocated over a run, traced by tracemalloc
+class _TracedMemory:
+    def __init__(self):
+        self._tracing = tracemalloc.is_tracing()
+        if not self._tracing:
+            tracemalloc.start()
+        self._base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def stop(self):
+        peak = tracemalloc.get_traced_memory()[1] - self._base
+        if not self._tracing:
+            tracemalloc.stop()
+        return peak
+
+
+def _getAttribute(owner, attribute):
+    if isinstance(owner, dict):
+        return owner[attribute]
+    # From the class itself, so that restoring puts back exactly what was there
+    return vars(owner)[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+
+
+def _setAttribute(owner, attribute, value):
+    if isinstance(owner, dict):
+        owner[attribute] = value
+    else:
+        setattr(owner, attribute, value)
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+import math
+import multiprocessing
+import time
+
+from TSPClasses import TSPSolution
+
+
+# Least number of seconds between two updates sent to a progress callback
+REPORT_INTERVAL = 0.1
+
+
+''' <summary>
+	Anytime reporting and cooperative cancellation for one solve.  Search
+	loops call cancelled() wherever they check their deadline, and
+	improved(route, cost, **counters) whenever they find a tour; route is a
+	list or array of city indices, or a TSPSolution that may go on being
+	improved in place.  Only tours cheaper than every one reported before
+	count, and the callback gets at most one update per REPORT_INTERVAL: a
+	tour held back is sent, if nothing newer replaces it, by the first
+	cancelled() poll once the interval is up (or by finish()).  An update is a
+	dictionary with solver, cost, soln (a TSPSolution of its own), time
+	(seconds since the solve started), timestamp (time.time()), count
+	(improvements so far) and the counters.
+	</summary>
+'''
+
+class Progress:
+    def __init__(self, solver, scenario, callback=None, cancel_event=None, interval=REPORT_INTERVAL):
+        self.solver = solver
+        self.start_time = time.time()
+        self.best_cost = math.inf
+        self.count = 0
+        self._scenario = scenario
+        self._callback = callback
+        self._cancel_event = cancel_event
+        self._interval = interval
+        self._pending = None
+        self._last_report = -math.inf
+
+    # Search loops poll this all the time, so it is also where held-back updates go out
+    def cancelled(self):
+        if self._pending is not None and time.time() - self._last_report >= self._interval:
+            self._report()
+        return self._cancel_event is not None and self._cancel_event.is_set()
+
+    def improved(self, route, cost, **counters):
+        if not cost < self.best_cost:
+            return
+        self.best_cost = cost
+        self.count += 1
+        if self._callback is None:
+            return
+        self._pending = (route, counters)
+        if time.time() - self._last_report >= self._interval:
+            self._report()
+
+    # Reports the solve's final solution if it is new, and anything held back
+    def finish(self, results):
+        if results.get('soln') is not None:
+            self.improved(results['soln'], results['cost'])
+        if self._pending is not None:
+            self._report()
+
+    def _report(self):
+        route, counters = self._pending
+        self._pending = None
+        if isinstance(route, TSPSolution):
+            soln = route.copy()
+        else:
+            soln = TSPSolution(route, self._scenario)
+        now = self._last_report = time.time()
+        update = {'solver': self.solver, 'cost': soln.cost, 'soln': soln, 'time': now - self.start_time,
+                  'timestamp': now, 'count': self.count}
+        update.update(counters)
+        self._callback(update)
+
+
+''' <summary>
+	The cancellation side of a Progress for pool workers: a flag in shared
+	memory (handed to the workers through the pool initializer) that the
+	solving process raises when its own Progress is cancelled.  Workers can
+	pass it wherever a progress is expected; it does not report.
+	</summary>
+'''
+
+class SharedCancel:
+    def __init__(self):
+        self._flag = multiprocessing.Value('b', 0, lock=False)
+
+    def cancel(self):
+        self._flag.value = 1
+
+    def cancelled(self):
+        return bool(self._flag.value)
+
+    def improved(self, route, cost, **counters):
+        pass
+
+
+''' <summary>
+	Results of a pool imap as they arrive.  After each result, and every
+	REPORT_INTERVAL while waiting, it raises shared_cancel if progress has
+	been cancelled (which also lets progress send a held-back update); while
+	waiting it also calls waiting() (if given), e.g. to report the workers'
+	best tour so far.  Without a progress it just iterates.
+	</summary>
+'''
+
+def pollResults(results, progress, shared_cancel, waiting=None):
+    if progress is None:
+        yield from results
+        return
+    while True:
+        try:
+            yield results.next(timeout=REPORT_INTERVAL)
+        except StopIteration:
+            return
+        except multiprocessing.TimeoutError:
+            if waiting is not None:
+                waiting()
+        if progress.cancelled():
+            shared_cancel.cancel()
@@ -1,59 +1,184 @@
 #!/usr/bin/python3
 
-from which_pyqt import PYQT_VER
-
-if PYQT_VER == 'PYQT5':
-    from PyQt5.QtCore import QLineF, QPointF
-elif PYQT_VER == 'PYQT4':
-    from PyQt4.QtCore import QLineF, QPointF
-else:
-    raise Exception('Unsupported Version of PyQt: {}'.format(PYQT_VER))
-
+# No Qt here: the solvers run headless (batch runs, pool workers); only Proj5GUI loads PyQt
+import functools
+import queue
+import threading
 import time
 import numpy as np
 from TSPClasses import *
-import heapq
-import itertools
+from TSPConstruction import BATCH_ELEMENTS, BATCH_STARTS, nearestNeighbourTour, nearestNeighbourTours, randomTour
+from TSPBounds import BOUNDS
+from TSPBranchAndBound import branchAndBoundSearch, parallelBranchAndBound
+from TSPHeldKarp import HELD_KARP_MEMORY, heldKarp, heldKarpMemory
+from TSPGenetic import GeneticAlgorithm, initialPopulation, islandGeneticAlgorithm
+from TSPLocalSearch import LK_DEPTH, NEIGHBOURS, chainedLinKernighan, improveTour
+from TSPProfile import Profiler
+from TSPProgress import Progress
+
+
+# Solver entry point decorator.  The outermost call (not the ones solvers make
+# to each other for a starting tour) gets a fresh TSPProgress.Progress as
+# self._progress, which sends improved tours to the solver's callback and sees
+# cancel(); results['cancelled'] says whether the solve was cut short.  Each
+# solve gets a new cancel flag, unless resetCancel() already made one for it
+# (so that a cancel() before the solve got going is not lost).  When the
+# solver is profiled the call runs under its Profiler and the report comes
+# back as results['profile'].
+def _entryPoint(method):
+    @functools.wraps(method)
+    def entry(self, *args, **kwargs):
+        if self._progress is not None:
+            return method(self, *args, **kwargs)
+        if self._cancel_reset:
+            self._cancel_reset = False
+        else:
+            self._cancel_event = threading.Event()
+        progress = self._progress = Progress(method.__name__, self._scenario, self.callback, self._cancel_event)
+        try:
+            if self.profiler is None:
+                results = method(self, *args, **kwargs)
+            else:
+                results, report = self.profiler.run(method.__name__, method, self, *args, **kwargs)
+                results['profile'] = report
+        finally:
+            self._progress = None
+        results['cancelled'] = progress.cancelled()
+        progress.finish(results)
+        return results
+    return entry
 
 
 class TSPSolver:
-    def __init__(self, gui_view):
+    # Share of the time allowance fancy() leaves for local search when asked to polish
+    LOCAL_SEARCH_SHARE = 0.1
+
+    # Share of the time allowance linKernighan gives to finding its start tour
+    LK_START_SHARE = 0.25
+
+    # profile: True (or a TSPProfile.Profiler, e.g. with cprofile) to instrument every solve.
+    # callback(update) is called with every improved BSSF (see TSPProgress.Progress).
+    def __init__(self, gui_view, profile=False, callback=None):
         self._scenario = None
+        self.profiler = profile if isinstance(profile, Profiler) else (Profiler() if profile else None)
+        self.callback = callback
+        self._cancel_event = threading.Event()
+        self._cancel_reset = False
+        self._progress = None
 
     def setupWithScenario(self, scenario):
         self._scenario = scenario
 
+    # Asks the running solve (from another thread, or from the callback) to stop
+    # as soon as it can; it still returns its best solution so far
+    def cancel(self):
+        self._cancel_event.set()
+
+    # Starts the cancel flag of the next solve now: call it before handing the
+    # solve to another thread, so that cancel() works from then on
+    def resetCancel(self):
+        self._cancel_event = threading.Event()
+        self._cancel_reset = True
+
+    ''' <summary>
+		Runs getattr(self, algorithm)(*args, **kwargs) on a separate thread and
+		yields each progress update as it arrives.  Closing the generator early
+		cancels the solve.
+		</summary>
+		<returns>(as the generator's return value, e.g. from yield from) the
+		results dictionary.</returns>
+	'''
+
+    def iterate(self, algorithm, *args, **kwargs):
+        updates = queue.Queue()
+        callback = self.callback
+        outcome = {}
+
+        def forward(update):
+            updates.put(update)
+            if callback is not None:
+                callback(update)
+
+        def solve():
+            try:
+                outcome['results'] = getattr(self, algorithm)(*args, **kwargs)
+            except BaseException as error:
+                outcome['error'] = error
+            finally:
+                updates.put(None)
+
+        self.callback = forward
+        self.resetCancel()
+        thread = threading.Thread(target=solve, daemon=True)
+        thread.start()
+        try:
+            while True:
+                update = updates.get()
+                if update is None:
+                    break
+                yield update
+        finally:
+            if thread.is_alive():
+                self.cancel()
+                thread.join()
+            self.callback = callback
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['results']
+
+    # Results of a solver that needs the dense cost matrix, for a scenario too big
+    # to build one (n x n and its temporaries would not fit in memory): no
+    # tour, status 'memory' (as heldKarp reports a table that does not fit)
+    def _refused(self, start_time, **extra):
+        results = {'cost': math.inf, 'time': time.time() - start_time, 'count': 0, 'soln': None, 'max': 0,
+                   'total': 0, 'pruned': 0, 'status': 'memory'}
+        results.update(extra)
+        return results
+
+    # Post-processing stage shared by the solvers: improve bssf in place with
+    # local search until it converges or the deadline passes (building the
+    # candidate lists counts against it too)
+    def _polish(self, bssf, deadline, neighbours=NEIGHBOURS):
+        candidates = None
+        if bssf is not None and time.time() < deadline:
+            candidates = self._scenario.nearestCities(neighbours, deadline=deadline)
+        if candidates is None:
+            return {'moves': 0, 'evaluated': 0}
+        return improveTour(bssf, candidates, deadline, progress=self._progress)
+
     ''' <summary>
 		This is the entry point for the default solver
 		which just finds a valid random tour.  Note this could be used to find your
-		initial BSSF.
+		initial BSSF.  The tour is built out of existing edges (see
+		TSPConstruction.randomTour) rather than by drawing permutations until one is
+		valid, which in Hard mode almost never happens beyond a few dozen cities.
 		</summary>
 		<returns>results dictionary for GUI that contains three ints: cost of solution, 
 		time spent to find solution, number of permutations tried during search, the 
 		solution found, and three null values for fields not used for this 
-		algorithm</returns> 
+		algorithm.  With local_search the tour is then improved by TSPLocalSearch and
+		the number of improving moves is returned as local_moves.</returns> 
 	'''
 
-    def defaultRandomTour(self, time_allowance=60.0):
+    @_entryPoint
+    def defaultRandomTour(self, time_allowance=60.0, local_search=False):
         results = {}
-        cities = self._scenario.getCities()
-        ncities = len(cities)
         foundTour = False
         count = 0
         bssf = None
         start_time = time.time()
-        while not foundTour and time.time() - start_time < time_allowance:
-            # create a random permutation
-            perm = np.random.permutation(ncities)
-            route = []
-            # Now build the route using the random permutation
-            for i in range(ncities):
-                route.append(cities[perm[i]])
-            bssf = TSPSolution(route)
+        # A random tour (as city indices); the same as np.random.permutation when no edge is missing
+        route = randomTour(self._scenario.getCosts(), np.random, start_time + time_allowance)
+        if route is not None:
+            bssf = TSPSolution(route, self._scenario)
             count += 1
             if bssf.cost < np.inf:
                 # Found a valid route
                 foundTour = True
+                self._progress.improved(bssf, bssf.cost)
+        if local_search:
+            results['local_moves'] = self._polish(bssf, start_time + time_allowance)['moves']
+            foundTour = bssf is not None and bssf.cost < np.inf
         end_time = time.time()
         results['cost'] = bssf.cost if foundTour else math.inf
         results['time'] = end_time - start_time
@@ -73,258 +198,290 @@ class TSPSolver:
 		<returns>results dictionary for GUI that contains three ints: cost of best solution, 
 		time spent to find best solution, total number of solutions found, the best
 		solution found, and three null values for fields not used for this 
-		algorithm</returns> 
+		algorithm.  local_search works as for defaultRandomTour.  With implicit costs
+		there is no matrix to sweep, so tours are built one start at a time through
+		the scenario's spatial index (TSPConstruction.nearestNeighbourTour), and a
+		tour the deadline cuts short is finished in random order.</returns> 
 	'''
 
-    def greedy(self, time_allowance=60.0):
-        import time
+    @_entryPoint
+    def greedy(self, time_allowance=60.0, num_starts=1, local_search=False):
         results = {}
-        cities = self._scenario.getCities()
-        ncities = len(cities)
+        implicit = self._scenario.implicit_costs
+        cost_matrix = None if implicit else self._scenario.getCostMatrix()
+        ncities = len(self._scenario.getCosts())
         count = 0
-        startTime = time.time()
+        start_time = time.time()
+        # Start cities are tried in order beginning with a random one.  A start
+        # that dead-ends just moves on to the next; num_starts tours (all of
+        # them if None) are swept in batches and the best one is kept.  Batches
+        # start at one tour and double up to BATCH_STARTS, so there is a tour
+        # early and a sweep cut off by the deadline only loses its own tours.
         startNode = random.randint(0, ncities - 1)
+        order = np.roll(np.arange(ncities), -startNode)
+        wanted = ncities if num_starts is None else min(num_starts, ncities)
+        max_batch = 1 if implicit else max(1, min(BATCH_STARTS, BATCH_ELEMENTS // ncities))
+        batch = 1
         bssf = None
-        foundTour = False
-        while foundTour is False and time.time() - startTime < time_allowance:
-            route = [cities[startNode]]
-            for i in range(ncities):
-                min = np.inf
-                nextNode = None
-                for j in range(ncities):
-                    if cities[j] not in route:
-                        length = route[i].costTo(cities[j])
-                        if length < math.inf and length < min:
-                            min = length
-                            nextNode = cities[j]
-                if nextNode is not None:
-                    route.append(nextNode)
-                else:
-                    break
-            startNode += 1
-            if len(route) == ncities:
-                bssf = TSPSolution(route)
-                count += 1
-                if bssf.cost < np.inf:
-                    foundTour = True
-
-        time = time.time() - startTime
+        tried = 0
+        while tried < ncities and time.time() - start_time < time_allowance and not self._progress.cancelled():
+            starts = order[tried:tried + (min(batch, wanted - tried) if tried < wanted else batch)]
+            tried += len(starts)
+            batch = min(2 * batch, max_batch)
+            if implicit:
+                route, cost = nearestNeighbourTour(self._scenario, starts[0], deadline=start_time + time_allowance,
+                                                   progress=self._progress)
+                routes, costs = route[np.newaxis], np.array([cost])
+            else:
+                routes, costs = nearestNeighbourTours(cost_matrix, starts, deadline=start_time + time_allowance,
+                                                      progress=self._progress)
+            count += int(np.isfinite(costs).sum())
+            best = np.argmin(costs)
+            if costs[best] < np.inf and (bssf is None or costs[best] < bssf.cost):
+                bssf = TSPSolution(routes[best], self._scenario, cost=int(costs[best]))
+                self._progress.improved(bssf, bssf.cost)
+            if bssf is not None and tried >= wanted:
+                break
+        if local_search:
+            results['local_moves'] = self._polish(bssf, start_time + time_allowance)['moves']
+        end_time = time.time()
 
-        results['cost'] = bssf.cost
-        results['time'] = time
+        results['cost'] = bssf.cost if bssf is not None else math.inf
+        results['time'] = end_time - start_time
         results['count'] = count
         results['soln'] = bssf
         results['max'] = None
         results['total'] = None
         results['pruned'] = None
         return results
-        pass
 
     ''' <summary>
-		This is the entry point for the branch-and-bound algorithm that you will implement
+		This is the entry point for the branch-and-bound algorithm that you will implement.
+		bound picks the lower-bounding strategy from TSPBounds.BOUNDS ('reduced' or
+		'assignment').  With workers > 1 the tree is split into subproblems that are
+		searched in a process pool sharing the best cost found so far.  policy sets the
+		search order (see TSPBranchAndBound.POLICIES) and start how the initial BSSF is
+		found (see BSSF_SEEDS, as for localSearch); that time counts against time_allowance.
 		</summary>
 		<returns>results dictionary for GUI that contains three ints: cost of best solution, 
 		time spent to find best solution, total number solutions found during search (does
 		not include the initial BSSF), the best solution found, and three more ints: 
-		max queue size, total number of states created, and number of pruned states.</returns> 
+		max queue size, total number of states created, and number of pruned states.
+		Also the peak queue memory (max_memory), the bound used and the average seconds
+		spent computing one bound (bound_time).  Parallel runs sum count, total and
+		pruned over all workers; max is the largest single queue.  Scenarios with
+		implicit costs have no matrix to search, so nothing is done and status is
+		'memory' (see _refused).</returns> 
 	'''
 
-    def branchAndBound(self, time_allowance=60.0):
+    # Ways to find the initial BSSF for branchAndBound
+    BSSF_SEEDS = {'random': 'defaultRandomTour', 'greedy': 'greedy', 'local': 'localSearch'}
+
+    @_entryPoint
+    def branchAndBound(self, time_allowance=60.0, bound='reduced', workers=1, policy='ratio', start='random'):
         results = {}
-        cities = self._scenario.getCities()
-        ncities = len(cities)
-        foundTour = False
-        count = 0
-        bssf = self.defaultRandomTour(time_allowance=60.0)['soln']
-        pruned = 0
-        max_q_size = 0
-        num_states = 0
-        Q = []
         start_time = time.time()
+        deadline = start_time + time_allowance
+        if self._scenario.implicit_costs:
+            return self._refused(start_time, max_memory=0, bound=bound, bound_time=0.0)
 
-        matrix = np.empty(shape=(len(cities), len(cities)), dtype=float)
-
-        root = TSPNode(0, matrix, [], 0)
+        # The initial BSSF comes out of the same time budget as the search
+        bssf = getattr(self, self.BSSF_SEEDS[start])(time_allowance=time_allowance)['soln']
+        best_cost = bssf.cost if bssf is not None else math.inf
 
         # Distances
-        for i, c1 in enumerate(cities):
-            for j, c2 in enumerate(cities):
-                root.m[i, j] = c1.costTo(c2)
+        cost_matrix = self._scenario.getCostMatrix()
+        bounding = BOUNDS[bound]()
+        root = bounding.rootNode(cost_matrix)
+
+        if workers > 1:
+            stats = parallelBranchAndBound(cost_matrix, bound, root, best_cost, deadline, workers, policy=policy,
+                                           progress=self._progress)
+        else:
+            stats = branchAndBoundSearch(cost_matrix, bounding, [root], best_cost, deadline, policy=policy,
+                                         progress=self._progress)
+        if stats['route'] is not None:
+            bssf = TSPSolution(stats['route'], self._scenario)
 
-        root.reduceMatrix(0, 0)
-        root.addCityAndUpdateCost(cities[0])
+        end_time = time.time()
+        results['cost'] = bssf.cost if bssf is not None else math.inf
+        results['time'] = end_time - start_time
+        results['count'] = stats['count']
+        results['soln'] = bssf
+        results['max'] = stats['max']
+        results['max_memory'] = stats['max_memory']
+        results['bound'] = bound
+        results['bound_time'] = stats['bound_time'] / stats['bounds'] if stats['bounds'] else 0.0
+        results['total'] = stats['total']
+        results['pruned'] = stats['pruned']
+        return results
 
-        # Adding the heap
-        heapq.heappush(Q, root)
+    ''' <summary>
+		Exact solver for small instances: Held-Karp dynamic programming over subsets
+		(see TSPHeldKarp.heldKarp).  Its time and memory depend only on the number of
+		cities (about 125 MB at 20 cities, doubling with each one more); if it would
+		need more than max_memory bytes no search is done and no solution is
+		returned.
+		</summary>
+		<returns>results dictionary for GUI that contains three ints: cost of the optimal
+		tour, time spent to find it, number of solutions found (1, or 0 if there is no
+		tour or the search could not finish), the optimal solution, and three more
+		ints: largest layer of subsets filled at once (max), states computed (total)
+		and states no path reaches (pruned).  Also the peak memory (max_memory) and
+		status ('solved', 'memory', 'timeout' or 'cancelled').</returns> 
+	'''
 
-        while len(Q) != 0 and time.time() - start_time < time_allowance:
-            node = heapq.heappop(Q)
+    @_entryPoint
+    def heldKarp(self, time_allowance=60.0, max_memory=HELD_KARP_MEMORY):
+        results = {}
+        start_time = time.time()
+        # Only build the dense matrix if the table fits; to refuse heldKarp just
+        # needs the size, which an ImplicitCostMatrix gives without computing anything
+        if heldKarpMemory(len(self._scenario._xs)) <= max_memory:
+            costs = self._scenario.getCostMatrix()
+        else:
+            costs = ImplicitCostMatrix(self._scenario)
+        stats = heldKarp(costs, start_time + time_allowance, max_memory, self._progress)
+        bssf = TSPSolution(stats['route'], self._scenario) if stats['route'] is not None else None
 
-            for i, dist in enumerate(node.m[node.city._index]):
-                num_states += 1
+        end_time = time.time()
+        results['cost'] = bssf.cost if bssf is not None else math.inf
+        results['time'] = end_time - start_time
+        results['count'] = 1 if bssf is not None else 0
+        results['soln'] = bssf
+        results['max'] = stats['max']
+        results['max_memory'] = stats['max_memory']
+        results['status'] = stats['status']
+        results['total'] = stats['total']
+        results['pruned'] = stats['pruned']
+        return results
 
-                if dist != np.inf and cities[i] not in node.route:  # Unvisited cities
+    ''' <summary>
+		Local search solver: builds a starting tour with the greedy (or random, see
+		start) solver and improves it with 2-opt / Or-opt moves restricted to each
+		city's neighbours cheapest candidates (see TSPLocalSearch.improveTour).
+		</summary>
+		<returns>results dictionary for GUI that contains three ints: cost of best solution, 
+		time spent to find best solution, number of improving moves made, the best
+		solution found, the number of candidate moves evaluated as total and two null
+		values for fields not used for this algorithm</returns> 
+	'''
 
-                    # Nodes creation
-                    next_node = TSPNode(node.lower_bound, np.copy(node.m), node.route.copy(), node.cost)
-                    next_node.addCityAndUpdateCost(cities[i])
-                    next_node.reduceMatrix(node.city._index, next_node.city._index)
+    @_entryPoint
+    def localSearch(self, time_allowance=60.0, start='greedy', neighbours=NEIGHBOURS):
+        results = {}
+        start_time = time.time()
+        bssf = getattr(self, self.BSSF_SEEDS[start])(time_allowance=time_allowance)['soln']
+        stats = self._polish(bssf, start_time + time_allowance, neighbours)
 
-                    if len(next_node.route) == len(
-                            cities):  # Checks to see if all cities has been visited and is accounted for in the travel
-                        solution = TSPSolution(next_node.route)
+        end_time = time.time()
+        results['cost'] = bssf.cost if bssf is not None else math.inf
+        results['time'] = end_time - start_time
+        results['count'] = stats['moves']
+        results['soln'] = bssf
+        results['max'] = None
+        results['total'] = stats['evaluated']
+        results['pruned'] = None
+        return results
 
-                        if solution.cost < bssf.cost:
-                            count += 1
-                            bssf = solution  # Check bssf for the tour
-                    else:  # And if the solution isn't the best cost
+    ''' <summary>
+		Lin-Kernighan style solver for large instances: starts from the greedy tour (a
+		random one if greedy finds none) given LK_START_SHARE of time_allowance, improves
+		it with variable-depth moves of up to max_depth 2-opt steps plus Or-opt over each
+		city's neighbours cheapest candidates, then keeps restarting from double-bridge
+		kicks of the best tour until time_allowance runs out (see
+		TSPLocalSearch.chainedLinKernighan).
+		</summary>
+		<returns>results dictionary for GUI that contains three ints: cost of best solution, 
+		time spent to find best solution, number of times the best tour improved (the
+		start tour and every kept restart), the best solution found, and three more ints:
+		number of restarts (total), restarts thrown away (pruned) and null for max.
+		Also the number of improving moves made (moves).</returns> 
+	'''
 
-                        if next_node.lower_bound < bssf.cost:
-                            heapq.heappush(Q, next_node)
-                            max_q_size = max(max_q_size, len(Q))
-                        else:
-                            pruned += 1  # To see if pruning is necessary
+    @_entryPoint
+    def linKernighan(self, time_allowance=60.0, max_depth=LK_DEPTH, neighbours=NEIGHBOURS):
+        results = {}
+        start_time = time.time()
+        deadline = start_time + time_allowance
+        bssf = self.greedy(time_allowance=time_allowance * self.LK_START_SHARE)['soln']
+        if bssf is None:
+            bssf = self.defaultRandomTour(time_allowance=deadline - time.time())['soln']
+        stats = {'moves': 0, 'restarts': 0, 'improvements': 0}
+        candidates = None
+        if bssf is not None and time.time() < deadline:
+            candidates = self._scenario.nearestCities(neighbours, deadline=deadline)
+        if candidates is not None:
+            rng = np.random.default_rng(np.random.randint(2**31))
+            bssf, stats = chainedLinKernighan(bssf, candidates, deadline, rng, max_depth=max_depth,
+                                              progress=self._progress)
 
         end_time = time.time()
-        results['cost'] = bssf.cost
+        results['cost'] = bssf.cost if bssf is not None else math.inf
         results['time'] = end_time - start_time
-        results['count'] = count
+        results['count'] = stats['improvements'] + 1 if bssf is not None else 0
         results['soln'] = bssf
-        results['max'] = max_q_size
-        results['total'] = num_states
-        results['pruned'] = pruned
+        results['max'] = None
+        results['total'] = stats['restarts']
+        results['pruned'] = stats['restarts'] - stats['improvements']
+        results['moves'] = stats['moves']
         return results
 
-        pass
-
     ''' <summary>
-		This is the entry point for the algorithm you'll write for your group project.
+		This is the entry point for the algorithm you'll write for your group project:
+		a genetic algorithm (TSPGenetic.GeneticAlgorithm) that evolves a population of
+		population_size tours, seeded with nearest-neighbour tours, using the given
+		crossover ('ox' or 'pmx'), tournament selection and elitism.  With islands > 1
+		that many populations evolve in parallel processes and swap their best tours
+		(see TSPGenetic.islandGeneticAlgorithm).
 		</summary>
 		<returns>results dictionary for GUI that contains three ints: cost of best solution, 
 		time spent to find best solution, total number of solutions found during search, the 
 		best solution found.  You may use the other three field however you like.
-		algorithm</returns> 
+		Here total is the number of children made, pruned the number that were worse
+		than both parents and max the number of generations (summed or maxed over
+		islands), plus each island's best cost (islands) and the number of migrants
+		accepted (migrations).  With local_search the GA stops LOCAL_SEARCH_SHARE of
+		the way before the time allowance and its best tour is polished by TSPLocalSearch
+		in the time left.  Like branchAndBound it refuses scenarios with implicit
+		costs.</returns> 
 	'''
 
-    def fancy(self, time_allowance=60.0):
-        import time
-        startTime = time.time()
+    @_entryPoint
+    def fancy(self, time_allowance=60.0, population_size=50, crossover='ox', islands=1, local_search=False):
         results = {}
-        pruned = 0
-        cities = self._scenario.getCities()
-        ncities = len(cities)
-        population1 = [self.greedy(time_allowance).get('soln')]
-        for y in range(ncities - 1):
-            population1 = np.append(population1, self.defaultRandomTour(time_allowance).get('soln'))
-        solutions = len(population1)
-        newPopulation = []
-        minArray = []
-        # Selection
-        for j in range(len(population1)):
-            minArray.append(population1[j].cost)
-        minimum = min(minArray)
-        states = 0
-        #print(minArray)
-        first = second = np.inf
-        firstIndex = 0
-        secondIndex = 0
-        for j in range(0, len(minArray)):
-            if minArray[j] < first:
-                second = first
-                first = minArray[j]
-                firstIndex = j
-            elif minArray[j] < second:
-                second = minArray[j]
-                secondIndex = j
-
-        parent1 = population1[firstIndex]
-        parent2 = population1[secondIndex]
-
-        newPopulation = []
-        newPopulation = np.append(newPopulation, parent1)
-        newPopulation = np.append(newPopulation, parent2)
-        while len(population1) > len(newPopulation) and time.time() - startTime < time_allowance:
-            minArray = []
-            # Selection
-            parent1 = 0
-            parent2 = 0
-
-            for j in range(len(newPopulation)):
-                minArray.append(newPopulation[j].cost)
-            first = second = np.inf
-            firstIndex = 0
-            secondIndex = 0
-            for j in range(0, len(minArray)):
-                if minArray[j] < first:
-                    second = first
-                    first = minArray[j]
-                    firstIndex = j
-                elif minArray[j] < second:
-                    second = minArray[j]
-                    secondIndex = j
-            parent1 = newPopulation[firstIndex]
-            parent2 = newPopulation[secondIndex]
-            # Crossover
-            child1Route = parent1.route
-            child2Route = parent2.route
-            for j in range(0, ncities // 2):
-                point = random.randint(1, ncities - 1)
-                if point == child1Route[len(child1Route) - 1] or point == child2Route[len(child2Route) - 1]:
-                    point = random.randint(1, ncities - 1)
-
-                swap1Index = None
-                swap2Index = None
-                for x in range(0, len(child1Route)):
-
-                    if child1Route[x]._index == point:
-                        swap1Index = x
-
-                for x in range(0, len(child2Route)):
-                    if child2Route[x]._index == point:
-                        swap2Index = x
-                child1Route[swap1Index], child1Route[swap2Index] = child1Route[swap2Index], child1Route[swap1Index]
-                child2Route[swap1Index], child2Route[swap2Index] = child2Route[swap2Index], child2Route[swap1Index]
-            # Mutation
-            index1 = random.randint(1, ncities - 3)
-            index2 = random.randint(1, ncities - 3)
-            child1Route[index1], child1Route[index2] = child1Route[index2], child1Route[index1]
-            child1 = TSPSolution(child1Route)
-
-            index1 = random.randint(1, ncities - 3)
-            index2 = random.randint(1, ncities - 3)
-
-            child2Route[index1], child2Route[index2] = child2Route[index2], child2Route[index1]
-            child2 = TSPSolution(child2Route)
-            states += 2
-            if child1.cost < parent1.cost or child1.cost < parent2.cost:
-                # Add to new population
-                newPopulation = np.append(population1, child1)
-                solutions += 1
-            elif child1.cost > parent1.cost and child1.cost > parent2.cost:
-                pruned += 1
-            if child2.cost < parent1.cost or child2.cost < parent2.cost:
-                # Add to new population
-                newPopulation = np.append(newPopulation, child2)
-                solutions += 1
-            elif child2.cost > parent1.cost and child2.cost > parent2.cost:
-                pruned += 1
-            array = []
-            for x in range(len(newPopulation)):
-                array = np.append(array, newPopulation[x].cost)
-            #print(array)
-            fittestIndex = np.argmin(array)
-            fittest = newPopulation[fittestIndex]
-
-        # Finding best solution
-
-        time = time.time() - startTime
-        results['cost'] = fittest.cost
-        results['time'] = time
-        results['count'] = solutions
-        results['soln'] = fittest
-        results['max'] = None
-        results['total'] = states
-        results['pruned'] = pruned
-        return results
+        start_time = time.time()
+        if self._scenario.implicit_costs:
+            return self._refused(start_time, islands=[], migrations=0)
+        cost_matrix = self._scenario.getCostMatrix()
+        seed = np.random.randint(2**31)
+        ga_deadline = start_time + time_allowance * ((1.0 - self.LOCAL_SEARCH_SHARE) if local_search else 1.0)
+
+        if islands > 1:
+            runs = islandGeneticAlgorithm(cost_matrix, islands, ga_deadline, seed,
+                                          population_size=population_size, crossover=crossover,
+                                          progress=self._progress)
+        else:
+            rng = np.random.default_rng(seed)
+            ga = GeneticAlgorithm(cost_matrix, population_size=population_size, crossover=crossover, rng=rng)
+            ga.initialize(initialPopulation(cost_matrix, population_size, rng))
+            ga.run(ga_deadline, progress=self._progress)
+            runs = [{'best_tour': ga.best_tour, 'best_cost': ga.best_cost, 'generations': ga.generations,
+                     'children': ga.children, 'rejected': ga.rejected, 'improvements': ga.improvements,
+                     'migrations': 0}]
+        best = min(runs, key=lambda run: run['best_cost'])
+        bssf = TSPSolution(best['best_tour'], self._scenario)
+        if local_search:
+            results['local_moves'] = self._polish(bssf, start_time + time_allowance)['moves']
 
-        pass
+        end_time = time.time()
+        results['cost'] = bssf.cost
+        results['time'] = end_time - start_time
+        results['count'] = sum(run['improvements'] for run in runs)
+        results['soln'] = bssf
+        results['max'] = max(run['generations'] for run in runs)
+        results['total'] = sum(run['children'] for run in runs)
+        results['pruned'] = sum(run['rejected'] for run in runs)
+        results['islands'] = [float(run['best_cost']) for run in runs]
+        results['migrations'] = sum(run['migrations'] for run in runs)
+        return results
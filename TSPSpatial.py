@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+
+import math
+import numpy as np
+
+
+# Average number of cities per grid cell
+CITIES_PER_CELL = 4
+
+
+''' <summary>
+	Uniform grid over a set of city coordinates.  Cities are sorted by cell
+	(row-major), so the cities of one grid row between two columns are one
+	contiguous slice and a square of cells is a handful of slices.  cities
+	picks a subset of the scenario's cities to index (all of them by
+	default); queries always answer with scenario city indices.
+	</summary>
+'''
+
+class SpatialGrid:
+    def __init__(self, xs, ys, cities=None, per_cell=CITIES_PER_CELL):
+        if cities is None:
+            cities = np.arange(len(xs))
+        self._xs, self._ys = xs, ys
+        self._per_cell = per_cell
+        self.cities = np.asarray(cities, dtype=np.intp)
+        px, py = xs[self.cities], ys[self.cities]
+        count = max(len(self.cities), 1)
+
+        self._x0 = px.min() if len(px) else 0.0
+        self._y0 = py.min() if len(py) else 0.0
+        width = max(px.max() - self._x0, 1e-12) if len(px) else 1e-12
+        height = max(py.max() - self._y0, 1e-12) if len(py) else 1e-12
+        self.cell = math.sqrt(width * height * per_cell / count) or max(width, height)
+        self.columns = int(width // self.cell) + 1
+        self.rows = int(height // self.cell) + 1
+
+        cx = np.minimum(((px - self._x0) // self.cell).astype(np.intp), self.columns - 1)
+        cy = np.minimum(((py - self._y0) // self.cell).astype(np.intp), self.rows - 1)
+        cell_ids = cy * self.columns + cx
+        order = np.argsort(cell_ids, kind='stable')
+        self._sorted = self.cities[order]
+        self._starts = np.searchsorted(cell_ids[order], np.arange(self.rows * self.columns + 1))
+
+    # A grid over just some of the cities, on the same coordinates
+    def subset(self, cities):
+        return SpatialGrid(self._xs, self._ys, cities, self._per_cell)
+
+    # Grid column and row holding a city (which need not be indexed), clipped to the grid
+    def cellOf(self, city):
+        cx = min(max(int((self._xs[city] - self._x0) // self.cell), 0), self.columns - 1)
+        cy = min(max(int((self._ys[city] - self._y0) // self.cell), 0), self.rows - 1)
+        return cx, cy
+
+    # Cities in the cells at most radius cells (in x and in y) from cell (cx, cy)
+    def square(self, cx, cy, radius):
+        x_lo, x_hi = max(cx - radius, 0), min(cx + radius, self.columns - 1)
+        y_lo, y_hi = max(cy - radius, 0), min(cy + radius, self.rows - 1)
+        rows = np.arange(y_lo, y_hi + 1) * self.columns
+        starts, ends = self._starts[rows + x_lo], self._starts[rows + x_hi + 1]
+        if len(rows) == 1 or x_lo == 0 and x_hi == self.columns - 1:
+            return self._sorted[starts[0]:ends[-1]]
+        return np.concatenate([self._sorted[s:e] for s, e in zip(starts, ends)])
+
+    # Shortest distance from each of cities to any indexed city outside the square
+    # of this radius around cell (cx, cy); infinite when the square is the whole grid
+    def clearance(self, cities, cx, cy, radius):
+        x, y = self._xs[cities], self._ys[cities]
+        gaps = [np.full(np.shape(x), np.inf)]
+        if cx - radius > 0:
+            gaps.append(x - (self._x0 + (cx - radius) * self.cell))
+        if cx + radius < self.columns - 1:
+            gaps.append(self._x0 + (cx + radius + 1) * self.cell - x)
+        if cy - radius > 0:
+            gaps.append(y - (self._y0 + (cy - radius) * self.cell))
+        if cy + radius < self.rows - 1:
+            gaps.append(self._y0 + (cy + radius + 1) * self.cell - y)
+        return np.maximum(np.min(gaps, axis=0), 0.0)
+
+    # Occupied cells as (cx, cy, cities) in sorted order
+    def occupiedCells(self):
+        counts = np.diff(self._starts)
+        for cell in np.flatnonzero(counts):
+            cy, cx = divmod(int(cell), self.columns)
+            yield cx, cy, self._sorted[self._starts[cell]:self._starts[cell + 1]]